@@ -31,18 +31,29 @@ _requestfile() {
     if [ "$comp_cword" -ge 1 ]; then
       local prevword="${comp_words[comp_cword-1]}"
 
-      if [ "$prevword" == "--replace" ] || [ "$prevword" == "-r" ]; then
+      if [ "$prevword" == "--replace" ] || [ "$prevword" == "-r" ] || \
+          [ "$prevword" == "--segments" ] || [ "$prevword" == "--concurrency" ] || \
+          [ "$prevword" == "--connect-timeout" ] || [ "$prevword" == "--read-timeout" ] || \
+          [ "$prevword" == "--retries" ] || [ "$prevword" == "--duplicate-after" ] || \
+          [ "$prevword" == "--namespaces" ] || [ "$prevword" == "--every" ] || \
+          [ "$prevword" == "--compare" ] || [ "$prevword" == "--until" ] || \
+          [ "$prevword" == "--max-memory" ]; then
         return
       elif [ "$prevword" == "--format" ] || [ "$prevword" == "-f" ]; then
         local formats
         formats="$formats body"
         formats="$formats verbose"
         formats="$formats requests-mock"
+        formats="$formats none"
         compgen -W "$formats" -- "$curword"
         return
+      elif [ "$prevword" == "--compress" ]; then
+        compgen -W "gzip deflate" -- "$curword"
+        return
       elif [ "$prevword" == "--output" ] || [ "$prevword" == "-o" ] || \
           [ "$prevword" == "--imports" ] || [ "$prevword" == "-i" ] || \
-          [ "$prevword" == "--exports" ] || [ "$prevword" == "-e" ]; then
+          [ "$prevword" == "--exports" ] || [ "$prevword" == "-e" ] || \
+          [ "$prevword" == "--unix-socket" ] || [ "$prevword" == "--record-replay" ]; then
         compgen -f -- "$curword"
         return
       fi
@@ -59,6 +70,25 @@ _requestfile() {
     opts="$opts --exports -e"
     opts="$opts --no-prompt -n"
     opts="$opts --ignore-redirects"
+    opts="$opts --watch -w"
+    opts="$opts --segments"
+    opts="$opts --unix-socket"
+    opts="$opts --if-stale"
+    opts="$opts --stdin"
+    opts="$opts --concurrency"
+    opts="$opts --adaptive"
+    opts="$opts --connect-timeout"
+    opts="$opts --read-timeout"
+    opts="$opts --retries"
+    opts="$opts --duplicate-after"
+    opts="$opts --namespaces"
+    opts="$opts --every"
+    opts="$opts --compare"
+    opts="$opts --until"
+    opts="$opts --compress"
+    opts="$opts --keep-encoding"
+    opts="$opts --max-memory"
+    opts="$opts --record-replay"
     opts="$(compgen -W "$opts" -- "$curword")"
   fi
 
@@ -0,0 +1,180 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, RequestException
+
+from request_file.unix import UnixAdapter
+
+CONGESTION_STATUSES = {429, 503}
+
+
+class CircuitOpenError(ConnectionError):
+    pass
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Breaker:
+    def __init__(self) -> None:
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+
+class Controller:
+    """
+    Adapts how many requests are in flight using additive increase/multiplicative decrease.
+
+    The limit grows while latency stays within tolerance of the lowest latency seen, and halves at most once per
+    round trip on 429/503 responses, connection errors or rising latency. Retry-After pauses all new requests, and
+    hosts which fail failure_threshold times in a row are shed for cooldown seconds before a single probe request is
+    let through.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        tolerance: float = 2.0,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+    ) -> None:
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.tolerance = tolerance
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.limit = float(min_limit)
+        self._slow_start = True
+        self._in_flight = 0
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._breakers: Dict[str, _Breaker] = {}
+        self._cond = threading.Condition()
+
+    def acquire(self, host: str) -> None:
+        with self._cond:
+            breaker = self._breakers.setdefault(host, _Breaker())
+            if breaker.failures >= self.failure_threshold:
+                if time.monotonic() < breaker.open_until or breaker.probing:
+                    raise CircuitOpenError(f"circuit open for {host}")
+                breaker.probing = True
+
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self._in_flight >= int(self.limit):
+                    self._cond.wait()
+                else:
+                    break
+            self._in_flight += 1
+
+    def cancel(self, host: str) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._breakers.setdefault(host, _Breaker()).probing = False
+            self._cond.notify_all()
+
+    def release(
+        self,
+        host: str,
+        latency: float,
+        status: Optional[int],
+        retry_after: Optional[float] = None,
+    ) -> None:
+        with self._cond:
+            now = time.monotonic()
+            self._in_flight -= 1
+
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+            congested = status is None or status in CONGESTION_STATUSES
+            if not congested:
+                if self._baseline is None or latency < self._baseline:
+                    self._baseline = latency
+                else:
+                    # Let the baseline drift up slowly in case the fastest response was a fluke
+                    self._baseline += (latency - self._baseline) * 0.01
+                congested = latency > self._baseline * self.tolerance
+
+            if congested:
+                if now - self._last_decrease > latency:
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._last_decrease = now
+                self._slow_start = False
+            elif self._slow_start:
+                self.limit = min(float(self.max_limit), self.limit + 1)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+            breaker = self._breakers.setdefault(host, _Breaker())
+            breaker.probing = False
+            if status is None or status >= 500:
+                breaker.failures += 1
+                if breaker.failures >= self.failure_threshold:
+                    breaker.open_until = now + self.cooldown
+            else:
+                breaker.failures = 0
+
+            self._cond.notify_all()
+
+
+class AdaptiveMixin:
+    controller: Controller
+
+    def send(self, request: PreparedRequest, *args: Any, **kwargs: Any) -> Response:
+        host = urlparse(request.url).netloc
+        self.controller.acquire(host)
+        start = time.monotonic()
+        try:
+            res = super().send(request, *args, **kwargs)  # type: ignore
+        except RequestException:
+            self.controller.release(host, time.monotonic() - start, None)
+            raise
+        except BaseException:
+            self.controller.cancel(host)
+            raise
+        self.controller.release(
+            host,
+            time.monotonic() - start,
+            res.status_code,
+            retry_after=(
+                parse_retry_after(res.headers.get("retry-after"))
+                if res.status_code in CONGESTION_STATUSES
+                else None
+            ),
+        )
+        return res
+
+
+class AdaptiveHTTPAdapter(AdaptiveMixin, HTTPAdapter):
+    def __init__(self, controller: Controller, **kwargs: Any) -> None:
+        self.controller = controller
+        super().__init__(**kwargs)
+
+
+class AdaptiveUnixAdapter(AdaptiveMixin, UnixAdapter):
+    def __init__(
+        self, controller: Controller, socket_path: Optional[str] = None, **kwargs: Any
+    ) -> None:
+        self.controller = controller
+        super().__init__(socket_path, **kwargs)
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from request_file.model import RequestFile
+
+
+@dataclass
+class CacheEntry:
+    inputs: str
+    status: int
+    output: List[str] = field(default_factory=list)
+    exports: Dict[str, str] = field(default_factory=dict)
+    expires: Optional[float] = None
+
+    def is_fresh(self, inputs: str) -> bool:
+        if self.inputs != inputs:
+            return False
+        return self.expires is None or time.time() < self.expires
+
+
+def input_hash(request_file: str, mdl: RequestFile, *extra: str) -> str:
+    """
+    Hashes everything which affects the result of sending a request file: its content, the model after replacements
+    have been made and any extra options such as the output format.
+    """
+    digest = hashlib.sha256()
+    with open(request_file, "rb") as fp:
+        for chunk in iter(lambda: fp.read(65536), b""):
+            digest.update(chunk)
+    digest.update(b"\0")
+    digest.update(mdl.json(sort_keys=True).encode("utf-8"))
+    for value in extra:
+        digest.update(b"\0")
+        digest.update(value.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _entry_path(cache_dir: str, request_file: str, namespace: str) -> str:
+    key = f"{namespace}\0{os.path.abspath(request_file)}".encode("utf-8")
+    return os.path.join(cache_dir, f"{hashlib.sha256(key).hexdigest()}.json")
+
+
+def load(cache_dir: str, request_file: str, namespace: str) -> Optional[CacheEntry]:
+    try:
+        with open(_entry_path(cache_dir, request_file, namespace), "r") as fp:
+            return CacheEntry(**json.load(fp))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def save(cache_dir: str, request_file: str, namespace: str, entry: CacheEntry) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(cache_dir, request_file, namespace)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump(asdict(entry), fp)
+    os.replace(tmp_path, path)
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import re
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from pydantic import ValidationError
+
+from request_file.export import parse_pathspec
+from request_file.model import RequestFile
+from request_file.units import parse_duration
+
+# Bump whenever check_model changes, so results cached by older versions are checked again
+CHECKER_VERSION = 2
+
+_placeholder_re = re.compile(r"\{\{\s*[A-Za-z_][A-Za-z0-9_]*\s*\}\}")
+
+
+def _strings(value: Any) -> Iterator[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for key, subvalue in value.items():
+            yield from _strings(key)
+            yield from _strings(subvalue)
+    elif isinstance(value, (list, tuple)):
+        for subvalue in value:
+            yield from _strings(subvalue)
+
+
+def check_model(mdl: RequestFile) -> List[str]:
+    problems: List[str] = []
+    strings = list(
+        _strings(
+            [
+                mdl.url,
+                mdl.method,
+                dict(mdl.headers),
+                mdl.replicas,
+                mdl.params,
+                mdl.body_text,
+                mdl.body_data,
+                mdl.body_json,
+            ]
+        )
+    )
+
+    for key in mdl.replacements:
+        if not any(key in string for string in strings):
+            problems.append(f"replacement '{key}' is never used")
+        # model.replace() makes replacements one after another, so a key inside another key breaks the longer one
+        for other_key in mdl.replacements:
+            if key != other_key and key in other_key:
+                problems.append(
+                    f"replacement '{key}' overlaps with replacement '{other_key}'"
+                )
+
+    for placeholder in sorted(
+        {match for string in strings for match in _placeholder_re.findall(string)}
+    ):
+        if placeholder not in mdl.replacements:
+            problems.append(f"placeholder '{placeholder}' has no replacement")
+
+    for key, pathspec in mdl.exports.items():
+        try:
+            parse_pathspec(pathspec)
+        except ValueError as exc:
+            problems.append(f"export '{key}': {exc}")
+
+    if isinstance(mdl.ttl, str):
+        try:
+            parse_duration(mdl.ttl)
+        except ValueError:
+            try:
+                parse_pathspec(mdl.ttl)
+            except ValueError as exc:
+                problems.append(f"ttl: not a duration and {exc}")
+
+    return problems
+
+
+def check_text(text: str) -> List[str]:
+    try:
+        raw = json.loads(text)
+    except ValueError as exc:
+        return [f"invalid JSON: {exc}"]
+    if not isinstance(raw, dict):
+        return ["request file must be a JSON object"]
+    try:
+        mdl = RequestFile(**raw)
+    except ValidationError as exc:
+        return [
+            f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+            for error in exc.errors()
+        ]
+    return check_model(mdl)
+
+
+def find_files(paths: Iterable[str]) -> Iterator[str]:
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(".json"):
+                    yield os.path.join(dirpath, filename)
+
+
+@lru_cache(maxsize=None)
+def _salt() -> bytes:
+    # The schema changes whenever the model does, which can change the result of checking a file
+    return hashlib.sha256(
+        f"{CHECKER_VERSION}\0{RequestFile.schema_json()}".encode("utf-8")
+    ).digest()
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.sha256(_salt() + content).hexdigest()
+
+
+def _load_cache(path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, "r") as fp:
+            cache = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return {
+        file: entry
+        for file, entry in cache.items()
+        if isinstance(entry, dict) and {"digest", "problems"} <= entry.keys()
+    }
+
+
+def _save_cache(path: str, cache: Dict[str, Dict[str, Any]]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump(cache, fp)
+    os.replace(tmp_path, path)
+
+
+def check(
+    paths: Iterable[str], cache_path: str, jobs: int = 0
+) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Checks every request file in the given files and directories, only re-checking files whose content has changed
+    since they were last checked.
+    """
+    cache = _load_cache(cache_path)
+    # Files with the same content have the same problems wherever they are
+    known = {entry["digest"]: entry["problems"] for entry in cache.values()}
+    results: Dict[str, Dict[str, Any]] = {}
+    pending: List[Tuple[str, str, str]] = []
+
+    for path in find_files(paths):
+        try:
+            with open(path, "rb") as fp:
+                content = fp.read()
+        except OSError as exc:
+            yield path, [f"cannot read file: {exc.strerror}"]
+            continue
+        digest = _digest(content)
+        if digest in known:
+            results[os.path.abspath(path)] = {
+                "digest": digest,
+                "problems": known[digest],
+            }
+            yield path, known[digest]
+        else:
+            pending.append((path, digest, content.decode("utf-8", errors="replace")))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+            checked = pool.map(
+                check_text,
+                [text for _, _, text in pending],
+                chunksize=max(1, len(pending) // (4 * (os.cpu_count() or 1))),
+            )
+            for (path, digest, _), problems in zip(pending, checked):
+                results[os.path.abspath(path)] = {
+                    "digest": digest,
+                    "problems": problems,
+                }
+                yield path, problems
+
+    # Only keep entries for files which still exist so the cache doesn't grow forever
+    _save_cache(
+        cache_path,
+        {
+            **{file: entry for file, entry in cache.items() if os.path.exists(file)},
+            **results,
+        },
+    )
+
+
+def main(*argv: str, cache_path: str) -> None:
+    parser = ArgumentParser(prog="request-file check")
+    parser.add_argument(
+        "paths",
+        type=str,
+        nargs="+",
+        help="Request files, or directories to search for request files.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        default=0,
+        type=int,
+        help="Number of processes to check files with; defaults to the number of CPUs.",
+        metavar="<n>",
+    )
+    args = parser.parse_args(argv[1:])
+
+    files = 0
+    failed = 0
+    for path, problems in check(args.paths, cache_path=cache_path, jobs=args.jobs):
+        files += 1
+        if problems:
+            failed += 1
+        for problem in problems:
+            print(f"{path}: {problem}")
+    print(f"check: {files - failed} of {files} file(s) ok")
+    if failed:
+        exit(1)
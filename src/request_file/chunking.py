@@ -0,0 +1,74 @@
+from typing import Iterable, List, Optional, Sequence
+from urllib.parse import urlencode
+
+from requests import Response
+
+from request_file import codec
+
+
+def split(
+    values: Sequence[str],
+    param: str,
+    base_length: int,
+    max_url_length: Optional[int] = None,
+    max_values: Optional[int] = None,
+) -> List[List[str]]:
+    """
+    Splits values into as few chunks as possible such that a URL of base_length with a chunk's values appended as
+    repeated query parameters stays within max_url_length, and no chunk has more than max_values values.
+    """
+    chunks: List[List[str]] = []
+    chunk: List[str] = []
+    length = base_length
+    for value in values:
+        # Every value costs a separator plus its encoded name=value pair
+        value_length = 1 + len(urlencode([(param, value)]))
+        full = max_values is not None and len(chunk) >= max_values
+        too_long = max_url_length is not None and length + value_length > max_url_length
+        if chunk and (full or too_long):
+            chunks.append(chunk)
+            chunk = []
+            length = base_length
+        if max_url_length is not None and base_length + value_length > max_url_length:
+            raise ValueError(
+                f"a single value of {param} makes the URL longer than {max_url_length}"
+            )
+        chunk.append(value)
+        length += value_length
+    if chunk or not chunks:
+        chunks.append(chunk)
+    return chunks
+
+
+def merge(responses: Iterable[Response]) -> Response:
+    """
+    Merges responses whose bodies are JSON arrays into one response, in order. If any response failed, it is returned
+    instead.
+    """
+    responses = list(responses)
+    for res in responses:
+        if not res.ok:
+            return res
+
+    items: List[object] = []
+    for res in responses:
+        body = codec.loads(res.content)
+        if not isinstance(body, list):
+            raise ValueError("chunked responses must be JSON arrays to be merged")
+        items.extend(body)
+
+    first = responses[0]
+    merged = Response()
+    merged.status_code = first.status_code
+    merged.reason = first.reason
+    merged.url = first.url
+    merged.request = first.request
+    merged.headers.update(first.headers)
+    for header in ("content-length", "content-encoding", "transfer-encoding"):
+        merged.headers.pop(header, None)
+    merged.encoding = "utf-8"
+    merged.elapsed = max(res.elapsed for res in responses)
+    merged._content = codec.dumps(items)
+    # There is no raw stream behind the body, so iter_content must read it from _content
+    merged._content_consumed = True
+    return merged
@@ -0,0 +1,54 @@
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Generic, Mapping, TypeVar
+
+T = TypeVar("T")
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def request_key(method: str, url: str, headers: Mapping[str, str], body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (
+        method.upper(),
+        url,
+        *(f"{key.lower()}: {value}" for key, value in sorted(headers.items())),
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class SingleFlight(Generic[T]):
+    """
+    Ensures only one call is made at a time for each key, with any concurrent callers sharing its result. Results
+    are forgotten as soon as the call completes, so later callers always make a call of their own.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, "Future[T]"] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = Future()
+                self._calls[key] = call
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as exc:
+            with self._lock:
+                del self._calls[key]
+            call.set_exception(exc)
+            raise
+        with self._lock:
+            del self._calls[key]
+        call.set_result(result)
+        return result
@@ -0,0 +1,93 @@
+import json
+import os
+import re
+from sys import stderr
+from typing import Any, Callable, Dict, NamedTuple, Union
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    import ujson
+except Exception:
+    ujson = None
+
+
+class Codec(NamedTuple):
+    name: str
+    loads: Callable[[Union[str, bytes]], Any]
+    dumps: Callable[[Any, bool], bytes]
+
+
+# All codecs produce UTF-8 without escaping, either compact or indented by two spaces. Floats may be written
+# differently, e.g. 1e+16 or 1e16, but read back as the same value
+
+
+def _json_dumps(obj: Any, pretty: bool = False) -> bytes:
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+# orjson reads integers which don't fit in 64 bits as floats, so text which might hold one goes to json instead
+_long_int_re = re.compile(rb"\d{19}")
+_long_int_str_re = re.compile(r"\d{19}")
+
+
+def _orjson_loads(data: Union[str, bytes]) -> Any:
+    if (_long_int_str_re if isinstance(data, str) else _long_int_re).search(data):
+        return json.loads(
+            data if isinstance(data, (str, bytes)) else str(data, "utf-8")
+        )
+    return orjson.loads(data)
+
+
+def _orjson_dumps(obj: Any, pretty: bool = False) -> bytes:
+    option = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    try:
+        return orjson.dumps(obj, option=option)
+    except TypeError:
+        # e.g. an integer which doesn't fit in 64 bits
+        return _json_dumps(obj, pretty)
+
+
+def _ujson_dumps(obj: Any, pretty: bool = False) -> bytes:
+    return ujson.dumps(
+        obj, ensure_ascii=False, escape_forward_slashes=False, indent=2 if pretty else 0
+    ).encode("utf-8")
+
+
+codecs: Dict[str, Codec] = {"json": Codec("json", json.loads, _json_dumps)}
+if ujson is not None:
+    codecs["ujson"] = Codec("ujson", ujson.loads, _ujson_dumps)
+if orjson is not None:
+    codecs["orjson"] = Codec("orjson", _orjson_loads, _orjson_dumps)
+
+
+def _default() -> Codec:
+    # The fastest available codec is registered last, but REQUESTFILE_JSON can pick another, e.g. json
+    name = os.environ.get("REQUESTFILE_JSON")
+    if name and name not in codecs:
+        print(
+            f"codec: REQUESTFILE_JSON={name} is not available, using {list(codecs)[-1]}",
+            file=stderr,
+        )
+    return codecs.get(name or "", list(codecs.values())[-1])
+
+
+default = _default()
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    if not isinstance(data, (str, bytes, bytearray)):
+        # e.g. an mmap; orjson can read it in place, and the others decode it without copying it to bytes first
+        data = memoryview(data) if default.name == "orjson" else str(data, "utf-8")
+    return default.loads(data)
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    return default.dumps(obj, pretty)
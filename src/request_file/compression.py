@@ -0,0 +1,87 @@
+import zlib
+from contextlib import ExitStack
+from typing import Any, Iterable, Iterator, List, Optional
+
+from requests import Response
+
+from request_file import spool
+
+CHUNK_SIZE = 64 * 1024
+# The encodings which can be decoded without optional dependencies
+ACCEPT_ENCODING = "gzip, deflate"
+
+
+def _compressor(encoding: str) -> Any:
+    if encoding == "gzip":
+        return zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    if encoding == "deflate":
+        # HTTP deflate is the zlib format, not raw deflate
+        return zlib.compressobj(wbits=zlib.MAX_WBITS)
+    raise ValueError(f"unsupported content encoding: {encoding}")
+
+
+def compress(data: bytes, encoding: str) -> Iterator[bytes]:
+    """
+    Yields data compressed with encoding a chunk at a time, so the compressed body is never held in full.
+    """
+    compressor = _compressor(encoding)
+    view = memoryview(data)
+    for i in range(0, len(view), CHUNK_SIZE):
+        chunk = compressor.compress(view[i : i + CHUNK_SIZE])
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def can_decompress(encoding: Optional[str]) -> bool:
+    return (encoding or "identity").strip().lower() in ("identity", "gzip", "deflate")
+
+
+def decompress(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    if not can_decompress(encoding):
+        raise ValueError(f"unsupported content encoding: {encoding}")
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        yield from chunks
+        return
+
+    decompressor = None
+    for chunk in chunks:
+        if decompressor is None:
+            if encoding == "gzip":
+                wbits = zlib.MAX_WBITS | 16
+            # Some servers send raw deflate, which has no zlib header
+            elif (
+                len(chunk) >= 2
+                and (chunk[0] & 0x0F) == 8
+                and (chunk[0] << 8 | chunk[1]) % 31 == 0
+            ):
+                wbits = zlib.MAX_WBITS
+            else:
+                wbits = -zlib.MAX_WBITS
+            decompressor = zlib.decompressobj(wbits=wbits)
+        yield decompressor.decompress(chunk)
+    if decompressor is not None:
+        yield decompressor.flush()
+
+
+def save_raw(res: Response, paths: List[str], max_memory: Optional[int] = None) -> None:
+    """
+    Saves the body of a streamed response to paths exactly as it was received, still compressed if it was, and
+    leaves the decoded body in the response, spooled to disk past max_memory bytes.
+    """
+    encoding = res.headers.get("content-encoding")
+    with ExitStack() as stack:
+        files = [stack.enter_context(open(path, "wb")) for path in paths]
+
+        def received() -> Iterator[bytes]:
+            for chunk in res.raw.stream(CHUNK_SIZE, decode_content=False):
+                for fp in files:
+                    fp.write(chunk)
+                yield chunk
+
+        try:
+            res._content = spool.collect(decompress(received(), encoding), max_memory)
+        except zlib.error as exc:
+            raise ValueError(f"failed to decode {encoding} response: {exc}") from exc
+    res._content_consumed = True
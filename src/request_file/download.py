@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import requests
+
+from request_file import retry
+from request_file.model import RetryPolicy
+
+# A (connect, read) timeout in seconds, as taken by requests
+Timeout = Tuple[Optional[float], Optional[float]]
+_CHUNK_SIZE = 1024 * 1024
+
+
+class DownloadError(IOError):
+    def __init__(self, message: str, status: int = 0) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class Downloaded(NamedTuple):
+    length: int
+    status: int
+
+
+def probe(
+    session: requests.Session,
+    url: str,
+    headers: Mapping[str, str],
+    timeout: Timeout = (None, None),
+    policy: RetryPolicy = RetryPolicy(),
+) -> Optional[Tuple[int, Optional[str]]]:
+    """
+    Returns the length and ETag of the resource if the server supports byte range requests for it.
+    """
+    res = retry.send(
+        lambda: session.head(
+            url, headers=headers, allow_redirects=True, timeout=timeout
+        ),
+        method="HEAD",
+        policy=policy,
+    )
+    if res.status_code != 200:
+        return None
+    if res.headers.get("accept-ranges", "").lower() != "bytes":
+        return None
+    try:
+        length = int(res.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+    if length <= 0:
+        return None
+    return length, res.headers.get("etag")
+
+
+def split(length: int, segments: int) -> List[Tuple[int, int]]:
+    size = -(-length // segments)
+    return [(start, min(start + size, length) - 1) for start in range(0, length, size)]
+
+
+def _read_progress(path: str, expected: Dict[str, Any]) -> Optional[List[int]]:
+    try:
+        with open(path, "r") as fp:
+            progress = json.load(fp)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(progress, dict):
+        return None
+    if any(progress.get(key) != value for key, value in expected.items()):
+        # The resource or the segmenting has changed, so start again
+        return None
+    return progress.get("written")
+
+
+def _write_progress(path: str, progress: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump(progress, fp)
+    os.replace(tmp_path, path)
+
+
+def download(
+    session: requests.Session,
+    url: str,
+    headers: Mapping[str, str],
+    path: str,
+    segments: int,
+    timeout: Timeout = (None, None),
+    policy: RetryPolicy = RetryPolicy(),
+) -> Optional[Downloaded]:
+    """
+    Downloads the resource into path as concurrent byte range requests, resuming from a previous attempt if a
+    matching progress file exists next to it.
+
+    Returns the length of the resource and the status of the last response, or None if the server does not support
+    range requests.
+    """
+    # Offsets are into the body as stored, so it must not be compressed in transit
+    headers = {**headers, "Accept-Encoding": "identity"}
+    probed = probe(session, url, headers, timeout=timeout, policy=policy)
+    if probed is None:
+        return None
+    length, etag = probed
+    ranges = split(length, segments)
+
+    progress_path = f"{path}.progress"
+    expected = {
+        "url": url,
+        "length": length,
+        "etag": etag,
+        "ranges": [list(r) for r in ranges],
+    }
+    written = _read_progress(progress_path, expected)
+    if written is None or not os.path.exists(path):
+        written = [0] * len(ranges)
+    progress = {**expected, "written": written}
+    status = 200
+
+    # Preallocate so segments can be written at their offsets in any order
+    with open(path, "r+b" if os.path.exists(path) else "wb") as fp:
+        fp.truncate(length)
+    lock = threading.Lock()
+
+    def fetch(idx: int) -> None:
+        start, end = ranges[idx]
+        offset = start + written[idx]
+        if offset > end:
+            return
+        range_headers = {**headers, "Range": f"bytes={offset}-{end}"}
+        if etag:
+            range_headers["If-Range"] = etag
+        with retry.send(
+            lambda: session.get(
+                url, headers=range_headers, stream=True, timeout=timeout
+            ),
+            method="GET",
+            policy=policy,
+        ) as res:
+            if res.status_code != 206:
+                raise DownloadError(
+                    f"expected 206 Partial Content for bytes {offset}-{end}, got {res.status_code}",
+                    status=res.status_code,
+                )
+            nonlocal status
+            status = res.status_code
+            with open(path, "r+b") as fp:
+                fp.seek(offset)
+                for chunk in res.raw.stream(_CHUNK_SIZE, decode_content=False):
+                    fp.write(chunk)
+                    fp.flush()
+                    with lock:
+                        written[idx] += len(chunk)
+                        _write_progress(progress_path, progress)
+        if start + written[idx] <= end:
+            raise DownloadError(
+                f"incomplete segment for bytes {start}-{end}", status=status
+            )
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        for future in [pool.submit(fetch, idx) for idx in range(len(ranges))]:
+            future.result()
+
+    try:
+        os.remove(progress_path)
+    except FileNotFoundError:
+        pass
+    return Downloaded(length=length, status=status)
@@ -0,0 +1,163 @@
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from requests import Response
+
+from request_file import codec, compression
+from request_file.export import (
+    HEAD_PATHSPEC_TYPES,
+    parse_pathspec,
+    read_pathspec,
+    read_response_pathspec,
+)
+from request_file.format import Format
+from request_file.model import RequestFile
+
+EVENT_STREAM = "text/event-stream"
+NDJSON = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+CHUNK_SIZE = 64 * 1024
+
+
+class Event(NamedTuple):
+    type: str
+    data: str
+    id: Optional[str] = None
+
+
+def _media_types(header: str) -> Iterator[str]:
+    for part in header.split(","):
+        yield part.split(";")[0].strip().lower()
+
+
+def accepts_events(mdl: RequestFile) -> bool:
+    """
+    Returns whether the request asks for an event stream or NDJSON in its Accept header.
+    """
+    accept = next(
+        (value for key, value in mdl.headers.items() if key.lower() == "accept"), ""
+    )
+    return any(t == EVENT_STREAM or t in NDJSON for t in _media_types(accept))
+
+
+def is_event_stream(res: Response) -> bool:
+    media_type = next(_media_types(res.headers.get("content-type", "")))
+    return media_type == EVENT_STREAM or media_type in NDJSON
+
+
+def _iter_chunks(res: Response) -> Iterator[bytes]:
+    # read1() returns whatever has arrived instead of waiting for a full chunk
+    read1 = getattr(res.raw, "read1", None)
+    encoding = res.headers.get("content-encoding")
+    if read1 is None or not compression.can_decompress(encoding):
+        yield from res.iter_content(chunk_size=None)
+        return
+
+    def received() -> Iterator[bytes]:
+        while True:
+            chunk = read1(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    # requests leaves decoding to iter_content, so read1() returns the body as it was sent
+    yield from compression.decompress(received(), encoding)
+
+
+def _iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    pending = b""
+    for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8", "replace")
+    if pending:
+        yield pending.rstrip(b"\r").decode("utf-8", "replace")
+
+
+def _parse_sse(lines: Iterable[str]) -> Iterator[Event]:
+    # The last event id carries over to later events, as in the browser EventSource
+    event_type = "message"
+    data: List[str] = []
+    event_id: Optional[str] = None
+    for line in lines:
+        if not line:
+            if data:
+                yield Event(event_type, "\n".join(data), event_id)
+            event_type, data = "message", []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            data.append(value)
+        elif field == "event":
+            event_type = value
+        elif field == "id":
+            event_id = value
+
+
+def iter_events(res: Response) -> Iterator[Event]:
+    """
+    Yields the events of a text/event-stream response, or the lines of an NDJSON response, as they arrive. An event
+    cut off by the end of the stream is discarded.
+    """
+    lines = _iter_lines(_iter_chunks(res))
+    if next(_media_types(res.headers.get("content-type", ""))) == EVENT_STREAM:
+        yield from _parse_sse(lines)
+        return
+    for line in lines:
+        if line.strip():
+            yield Event("message", line)
+
+
+def format_head(res: Response, format: Format) -> Iterator[str]:
+    if format == Format.VERBOSE:
+        yield f"Status: {res.status_code} {res.reason}"
+        for key, value in res.headers.items():
+            yield f"{key}: {value}"
+
+
+def format_event(event: Event, format: Format) -> Iterator[Union[str, bytes]]:
+    if format == Format.NONE:
+        return
+    if format == Format.VERBOSE:
+        yield f"Event: {event.type}"
+    try:
+        yield codec.dumps(codec.loads(event.data), pretty=True)
+    except ValueError:
+        yield event.data
+
+
+def _read(event: Event, res: Response, pathspec: str) -> Any:
+    if parse_pathspec(pathspec)[0] in HEAD_PATHSPEC_TYPES:
+        return read_response_pathspec(res, pathspec)
+    return read_pathspec(text=event.data, pathspec=pathspec)
+
+
+def get_exports(
+    event: Event, res: Response, mdl: RequestFile, prefix: str = ""
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Yields the exports which can be read from an event. Most events only carry some of them, so the rest are skipped
+    quietly.
+    """
+    for key, pathspec in mdl.exports.items():
+        try:
+            value = _read(event, res, pathspec)
+        except Exception:
+            continue
+        if not isinstance(value, str):
+            value = codec.dumps(value).decode("utf-8")
+        yield f"{prefix}{key}", value
+
+
+def matches(event: Event, res: Response, pathspec: str) -> bool:
+    """
+    Returns whether the pathspec can be read from the event with a value which is not empty, false or null.
+    """
+    try:
+        value = _read(event, res, pathspec)
+    except Exception:
+        return False
+    return value is not None and value is not False and value not in ("", [], {})
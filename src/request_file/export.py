@@ -1,17 +1,43 @@
+import codecs
 import json
+import re
 from enum import Enum
+from functools import lru_cache
 from pathlib import Path
 from sys import stderr
-from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Match,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from requests import Response
 
+from request_file import codec, spool
 from request_file.files import read_var, write_var
 from request_file.model import RequestFile
+from request_file.units import parse_duration
 
 
 class PathspecType(str, Enum):
     JSON = "json"
+    HEADER = "header"
+    STATUS = "status"
+    REGEX = "regex"
+
+
+# Only these can be read without downloading the body
+HEAD_PATHSPEC_TYPES = {PathspecType.HEADER, PathspecType.STATUS}
+
+# Regexes are searched for in a sliding window of the body this big, so matches must be shorter
+REGEX_WINDOW = 64 * 1024
 
 
 class JSONPathError(ValueError):
@@ -23,7 +49,7 @@ class JSONPathError(ValueError):
         )
 
 
-def read_pathspec(text: str, pathspec: str) -> Any:
+def parse_pathspec(pathspec: str) -> Tuple[PathspecType, str]:
     try:
         typesep_idx = pathspec.index(":")
     except (ValueError, IndexError) as exc:
@@ -32,14 +58,75 @@ def read_pathspec(text: str, pathspec: str) -> Any:
     pathspec_type = pathspec[:typesep_idx]
     path = pathspec[typesep_idx + 1 :]
 
-    if pathspec_type == PathspecType.JSON:
+    try:
+        parsed_type = PathspecType(pathspec_type)
+    except ValueError as exc:
+        valid_values = ", ".join(f"'{v.value}'" for v in PathspecType)
+        raise ValueError(
+            f"unsupported pathspec type '{pathspec_type}'; valid values are {valid_values}"
+        ) from exc
+
+    if parsed_type == PathspecType.JSON:
         # e.g. "json:.rootkey.2.otherkey.value"
         # e.g. "json:.3.otherkey.value"
 
         if not path.startswith("."):
             raise ValueError("json pathspec must start with .")
 
-        _json = json.loads(text)
+    elif parsed_type == PathspecType.HEADER:
+        # e.g. "header:Location"
+        if not path:
+            raise ValueError("header pathspec must name a header")
+
+    elif parsed_type == PathspecType.STATUS:
+        # e.g. "status:"
+        if path:
+            raise ValueError("status pathspec must be empty")
+
+    elif parsed_type == PathspecType.REGEX:
+        # e.g. "regex:name=\"csrf\" value=\"([^\"]+)\""
+        _compile(path)
+
+    return parsed_type, path
+
+
+@lru_cache(maxsize=256)
+def _compile(pattern: str) -> Pattern[str]:
+    try:
+        return re.compile(pattern)
+    except re.error as exc:
+        raise ValueError(f"invalid regex pathspec: {exc}") from exc
+
+
+def _match_value(match: Match[str]) -> str:
+    # Use the first group if there is one so that context can be matched without being exported
+    return match.group(1) if match.re.groups else match.group(0)
+
+
+def _search(chunks: Iterable[str], pattern: Pattern[str]) -> str:
+    window = ""
+    for chunk in chunks:
+        window += chunk
+        match = pattern.search(window)
+        if match:
+            return _match_value(match)
+        window = window[-REGEX_WINDOW:]
+    raise ValueError(f"no match for regex '{pattern.pattern}'")
+
+
+def read_pathspec(text: Union[str, bytes], pathspec: str) -> Any:
+    pathspec_type, path = parse_pathspec(pathspec)
+
+    if pathspec_type in HEAD_PATHSPEC_TYPES:
+        raise ValueError(f"{pathspec_type.value} pathspec must be read from a response")
+
+    elif pathspec_type == PathspecType.REGEX:
+        if not isinstance(text, str):
+            text = str(text, "utf-8", "replace")
+        return _search([text], _compile(path))
+
+    elif pathspec_type == PathspecType.JSON:
+        _json = codec.loads(text)
         parts = path.split(".")[1:]
         pos: List[str] = []
         for part in parts:
@@ -69,11 +156,37 @@ def read_pathspec(text: str, pathspec: str) -> Any:
                 raise JSONPathError(pos=pos, value=_json)
 
         return _json
-    else:
-        valid_values = ", ".join(f"'{v.value}'" for v in PathspecType)
-        raise ValueError(
-            f"unsupported pathspec type '{pathspec_type}'; valid values are {valid_values}"
-        )
+
+
+def read_response_pathspec(res: Response, pathspec: str) -> Any:
+    pathspec_type, path = parse_pathspec(pathspec)
+
+    if pathspec_type == PathspecType.HEADER:
+        try:
+            return res.headers[path]
+        except KeyError as exc:
+            raise ValueError(f"no header '{path}'") from exc
+
+    elif pathspec_type == PathspecType.STATUS:
+        return str(res.status_code)
+
+    elif pathspec_type == PathspecType.REGEX:
+        # Works over the body whether or not it has been downloaded yet
+        decoder = codecs.getincrementaldecoder(res.encoding or "utf-8")("replace")
+        chunks = res.iter_content(chunk_size=REGEX_WINDOW)
+        return _search((decoder.decode(chunk) for chunk in chunks), _compile(path))
+
+    spool.warn_in_memory(res, f"{pathspec_type.value} pathspec")
+    return read_pathspec(text=res.content, pathspec=pathspec)
+
+
+def can_stream(mdl: RequestFile) -> bool:
+    """
+    Returns whether all of the exports can be read in at most one pass over the response body, without keeping it.
+    """
+    types = [parse_pathspec(pathspec)[0] for pathspec in mdl.exports.values()]
+    body_types = [t for t in types if t not in HEAD_PATHSPEC_TYPES]
+    return body_types in ([], [PathspecType.REGEX])
 
 
 def get_exports(
@@ -82,7 +195,7 @@ def get_exports(
     for key, pathspec in mdl.exports.items():
         key = f"{prefix}{key}"
         try:
-            value = read_pathspec(text=res.text, pathspec=pathspec)
+            value = read_response_pathspec(res, pathspec=pathspec)
         except Exception as exc:
             print(
                 f"get_exports: {key}: error: failed to read pathspec: {exc}",
@@ -92,7 +205,7 @@ def get_exports(
         yield key, value
 
 
-def save_exports(res: Response, mdl: RequestFile, path: str, prefix: str = "") -> None:
+def write_exports(exports: Iterable[Tuple[str, str]], path: str) -> None:
     existing: Dict[str, int] = {}
     lines: List[str] = []
     try:
@@ -108,7 +221,7 @@ def save_exports(res: Response, mdl: RequestFile, path: str, prefix: str = "") -
     except FileNotFoundError:
         pass
 
-    for key, value in get_exports(res, mdl, prefix):
+    for key, value in exports:
         line = f"{write_var(key, value)}\n"
         if key in existing:
             line_no = existing[key]
@@ -121,5 +234,24 @@ def save_exports(res: Response, mdl: RequestFile, path: str, prefix: str = "") -
         fp.write("\n")
 
 
+def get_ttl(res: Response, mdl: RequestFile) -> Optional[float]:
+    """
+    Returns how many seconds the exports of this response remain valid for, if the request file specifies it.
+    """
+    if mdl.ttl is None:
+        return None
+    if isinstance(mdl.ttl, (int, float)):
+        return float(mdl.ttl)
+    try:
+        return parse_duration(mdl.ttl)
+    except ValueError:
+        pass
+    try:
+        return float(read_response_pathspec(res, pathspec=mdl.ttl))
+    except Exception as exc:
+        print(f"get_ttl: error: failed to read pathspec: {exc}", file=stderr)
+        return None
+
+
 if __name__ == "__main__":
     print(read_pathspec(json.dumps({"a": [{"b": "c"}]}), pathspec="jsons:.a.0.b"))
@@ -1,10 +1,10 @@
-import json
 from base64 import b64encode
 from enum import Enum
 from typing import Iterable, Union
 
 from requests import Response
 
+from request_file import codec, spool
 from request_file.model import RequestFile
 
 
@@ -12,21 +12,30 @@ class Format(str, Enum):
     BODY = "body"
     VERBOSE = "verbose"
     REQUESTS_MOCK = "requests-mock"
+    NONE = "none"
     DEFAULT = BODY
 
 
 def format(
     res: Response, mdl: RequestFile, format: Format
 ) -> Iterable[Union[str, bytes]]:
-    if format == Format.BODY:
+    if format == Format.NONE:
+        return
+
+    elif format == Format.BODY:
+        # Spooled bodies are too large to re-indent in memory, so they are written as they were received
+        if spool.is_spooled(res):
+            yield res.content
+            return
         try:
-            _json = res.json()
-            yield json.dumps(_json, indent=2)
+            _json = codec.loads(res.content)
+            yield codec.dumps(_json, pretty=True)
         except ValueError:
             yield res.text
         return
 
     elif format == Format.REQUESTS_MOCK:
+        spool.warn_in_memory(res, "--format requests-mock")
         mock_args = {
             "method": mdl.method,
             "url": res.url,
@@ -36,7 +45,7 @@ def format(
             "headers": dict(res.headers),
         }
         try:
-            res_json = res.json()
+            res_json = codec.loads(res.content)
         except ValueError:
             content_type = res.headers.get("content-type", "text/plain").split(";")[0]
             if content_type.startswith("text/"):
@@ -45,7 +54,7 @@ def format(
                 mock_args["content"] = str(b64encode(res.content), encoding="utf-8")
         else:
             mock_args["json"] = res_json
-        yield json.dumps(mock_args, indent=2)
+        yield codec.dumps(mock_args, pretty=True)
         return
 
     elif format == Format.VERBOSE:
@@ -53,9 +62,12 @@ def format(
         for key, value in res.headers.items():
             yield f"{key}: {value}"
         yield "Body:"
+        if spool.is_spooled(res):
+            yield res.content
+            return
         try:
-            _json = res.json()
-            yield json.dumps(_json, indent=2)
+            _json = codec.loads(res.content)
+            yield codec.dumps(_json, pretty=True)
         except ValueError:
             yield res.text
         return
@@ -1,20 +1,61 @@
 import argparse
 import atexit
+import dataclasses
+import hashlib
+import sys
+import time
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from os import environ, makedirs, path
-from sys import argv, stderr
-from typing import Dict, Iterable, List, Sequence, Tuple
+from functools import partial
+from os import environ, makedirs, path, stat
+from shutil import copyfile
+from sys import argv, stderr, stdin
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from urllib import parse as urlparse
 
 import requests
 from appdirs import user_state_dir
 
-from request_file import model
-from request_file.export import get_exports, save_exports
+from request_file import (
+    adaptive,
+    cache,
+    check,
+    chunking,
+    codec,
+    coalesce,
+    compression,
+    download,
+    events,
+    metrics,
+    model,
+    pipeline,
+    poll,
+    replay,
+    replicas,
+    retry,
+    serve,
+    spool,
+    unix,
+    watch,
+)
+from request_file.export import can_stream, get_exports, get_ttl, write_exports
 from request_file.files import read_var, write_var
 from request_file.format import Format, format
 from request_file.history import InputHistory
+from request_file.units import parse_duration, parse_size
 
 try:
     import readline
@@ -22,6 +63,13 @@ except Exception:
     readline = None
 
 
+def _parse_namespaces(input: str) -> List[str]:
+    namespaces = [namespace.strip() for namespace in input.split(",")]
+    if not all(namespaces):
+        raise ValueError("namespaces must not be empty")
+    return namespaces
+
+
 def _parse_replacement(input: str) -> Tuple[str, str]:
     try:
         key, value = read_var(input)
@@ -43,12 +91,38 @@ class _Arguments(argparse.Namespace):
     output_files: List[str]
     allow_redirects: bool
     no_prompt: bool
+    watch: bool
+    segments: int
+    unix_socket: Optional[str]
+    if_stale: bool
+    stdin: bool
+    concurrency: int
+    adaptive: bool
+    connect_timeout: Optional[float]
+    read_timeout: Optional[float]
+    retries: Optional[int]
+    hedge: Optional[float]
+    namespaces: List[str]
+    every: Optional[float]
+    compare: List[str]
+    until: Optional[str]
+    compress: Optional[model.ContentEncoding]
+    keep_encoding: bool
+    max_memory: Optional[int]
+    record_replay: Optional[str]
+
 
+T = TypeVar("T")
 
 _state_dir = user_state_dir("request-file", "audoh")
 _input_history_path = path.join(_state_dir, "last-inputs")
 _readline_history_path = path.join(_state_dir, "readline-history")
 _env_path = path.join(_state_dir, "environment")
+_metrics_path = path.join(_state_dir, "metrics")
+_cache_dir = path.join(_state_dir, "cache")
+_check_cache_path = path.join(_state_dir, "check-cache")
+_replicas_path = path.join(_state_dir, "replicas")
+_serve_index_path = path.join(_state_dir, "serve-index")
 _input_history = InputHistory()
 _exported_vars: Dict[str, str] = {}
 
@@ -95,16 +169,982 @@ def _save_history() -> None:
         fp.write("\n")
 
 
-def main(*argv: str) -> None:
-    _init_history()
-    atexit.register(_save_history)
+def _stats(*argv: str) -> None:
+    metrics.main(*argv, metrics_path=_metrics_path)
 
-    # Arg parsing
-    parser = ArgumentParser()
+
+def _check(*argv: str) -> None:
+    check.main(*argv, cache_path=_check_cache_path)
+
+
+def _serve(*argv: str) -> None:
+    serve.main(*argv, index_path=_serve_index_path)
+
+
+def _replay_log(*argv: str) -> None:
+    options = replay.parse_args(*argv)
+    _import_env(options.imports_files)
+    namespace = environ.get("REQUESTFILE_NAMESPACE", "")
+    args = dataclasses.replace(
+        _Arguments(**vars(_parser().parse_args([]))),
+        concurrency=options.concurrency,
+    )
+    with _session(args) as session:
+        replay.main(
+            options,
+            execute=lambda spec: _execute_spec(
+                session, spec, args=args, namespace=namespace
+            ),
+        )
+
+
+_commands = {
+    "check": _check,
+    "replay": _replay_log,
+    "serve": _serve,
+    "stats": _stats,
+}
+_models: Dict[str, Tuple[float, model.RequestFile]] = {}
+
+
+def _load_model(request_file: str) -> model.RequestFile:
+    # Only re-parse request files which have changed since they were last loaded
+    mtime = stat(request_file).st_mtime
+    cached = _models.get(request_file)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    mdl = model.RequestFile.load(request_file)
+    _models[request_file] = (mtime, mdl)
+    return mdl
+
+
+def _import_env(import_files: Iterable[str]) -> None:
+    for import_file in import_files:
+        with open(import_file, "r") as fp:
+            for line in fp:
+                try:
+                    import_key, import_value = read_var(line)
+                except ValueError:
+                    continue
+                environ[import_key] = import_value
+
+
+def _resolve(
+    mdl: model.RequestFile,
+    replacements: Dict[str, str],
+    namespace: str,
+    no_prompt: bool,
+) -> model.RequestFile:
+    env_prefix = f"{namespace}_" if namespace else ""
+    replaced: Dict[str, str] = {}
+    for replacement_key, replacement in mdl.replacements.items():
+        # Use explicit argument first
+        input_replacement = replacements.get(replacement.name)
+        is_set = input_replacement is not None
+        # Try to use environment var second
+        if not is_set:
+            input_replacement = environ.get(f"{env_prefix}{replacement.name}")
+            is_set = input_replacement is not None
+        # Use default value third if specified but offer the ability to override it
+        default_value = (
+            replacement.default
+            if replacement.has_default
+            else _input_history.get_last_input(replacement.name, namespace=namespace)
+        )
+        if not is_set and (replacement.has_default or default_value):
+            if not no_prompt:
+                input_replacement = input(
+                    f"Enter a value for {replacement.name} ({default_value}): "
+                )
+            if not no_prompt and input_replacement:
+                _input_history.update_input(
+                    replacement.name, input_replacement, namespace=namespace
+                )
+            else:
+                input_replacement = default_value
+            is_set = True
+        # If no default specified but the replacement is required, prompt for value
+        if not is_set and replacement.required:
+            if not no_prompt:
+                input_replacement = input(f"Enter a value for {replacement.name}: ")
+                if input_replacement:
+                    _input_history.update_input(
+                        replacement.name, input_replacement, namespace=namespace
+                    )
+                    is_set = True
+        # If we still haven't got a replacement then leave as-is
+        if not is_set:
+            continue
+        if isinstance(input_replacement, str):
+            # Defaults which aren't strings come from the request file, so they'll be the same next time
+            replaced[replacement.name] = input_replacement
+            parsed = model.parse_replacement(value=input_replacement, model=replacement)
+        else:
+            parsed = input_replacement
+        mdl = model.replace(mdl, old=replacement_key, new=parsed)
+    return mdl.with_replaced(replaced) if replaced else mdl
+
+
+def _build_url(mdl: model.RequestFile) -> str:
+    qsl = urlparse.parse_qsl(urlparse.urlparse(mdl.url).query)
+    for param, param_value in mdl.params.items():
+        if param_value is None:
+            continue
+        elif isinstance(param_value, str):
+            qsl.append((param, param_value))
+        elif isinstance(param_value, Sequence):
+            for param_subvalue in param_value:
+                if param_subvalue is None:
+                    continue
+                qsl.append((param, param_subvalue))
+        else:
+            qsl.append((param, str(param_value)))
+    qs = urlparse.urlencode(qsl)
+    # urljoin() ignores schemes it doesn't know, such as http+unix
+    return urlparse.urlunparse(
+        urlparse.urlparse(mdl.url)._replace(query=qs, fragment="")
+    )
+
+
+def _first(*values: Optional[T]) -> Optional[T]:
+    return next((value for value in values if value is not None), None)
+
+
+def _send(
+    session: requests.Session,
+    mdl: model.RequestFile,
+    url: str,
+    request_file: str,
+    args: _Arguments,
+    flights: Optional[coalesce.SingleFlight[requests.Response]] = None,
+    stream: bool = False,
+) -> requests.Response:
+    # Every request is sent from here, so a request file's chunking is never ignored
+    if mdl.chunking is not None:
+        return _send_chunked(
+            session,
+            mdl=mdl,
+            config=mdl.chunking,
+            request_file=request_file,
+            args=args,
+            flights=flights,
+        )
+    if mdl.replicas:
+        return _send_replicas(
+            session,
+            mdl=mdl,
+            url=url,
+            request_file=request_file,
+            args=args,
+            flights=flights,
+            stream=stream,
+        )
+    return _send_coalesced(
+        session,
+        mdl=mdl,
+        url=url,
+        request_file=request_file,
+        args=args,
+        flights=flights,
+        stream=stream,
+    )
+
+
+def _send_replicas(
+    session: requests.Session,
+    mdl: model.RequestFile,
+    url: str,
+    request_file: str,
+    args: _Arguments,
+    flights: Optional[coalesce.SingleFlight[requests.Response]] = None,
+    stream: bool = False,
+) -> requests.Response:
+    stats = replicas.load(_replicas_path)
+    bases = replicas.split(mdl.replicas)
+    error: Optional[requests.RequestException] = None
+    for base in stats.order(bases):
+        start = time.perf_counter()
+        try:
+            res = _send_coalesced(
+                session,
+                mdl=mdl,
+                url=replicas.rebase(url, base),
+                request_file=request_file,
+                args=args,
+                flights=flights,
+                stream=stream,
+            )
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            stats.record(base, latency=None, error=True)
+            # A request which may have reached the server is only sent again if it's idempotent
+            if not retry.can_resend(exc, method=mdl.method, policy=mdl.retry):
+                raise
+            print(f"replicas: {base}: error: {exc}", file=stderr)
+            error = exc
+            continue
+        stats.record(
+            base, latency=time.perf_counter() - start, error=res.status_code >= 500
+        )
+        return res
+    assert error is not None
+    raise error
+
+
+def _send_coalesced(
+    session: requests.Session,
+    mdl: model.RequestFile,
+    url: str,
+    request_file: str,
+    args: _Arguments,
+    flights: Optional[coalesce.SingleFlight[requests.Response]] = None,
+    stream: bool = False,
+) -> requests.Response:
+    # Streamed bodies can only be read once, so they can't be shared
+    if stream or flights is None or mdl.method.upper() not in coalesce.SAFE_METHODS:
+        return _send_once(
+            session,
+            mdl=mdl,
+            url=url,
+            request_file=request_file,
+            args=args,
+            stream=stream,
+        )
+    key = coalesce.request_key(
+        mdl.method, url=url, headers=mdl.headers, body=mdl.content
+    )
+    return flights.do(
+        key,
+        lambda: _send_once(
+            session, mdl=mdl, url=url, request_file=request_file, args=args
+        ),
+    )
+
+
+def _send_chunked(
+    session: requests.Session,
+    mdl: model.RequestFile,
+    config: model.Chunking,
+    request_file: str,
+    args: _Arguments,
+    flights: Optional[coalesce.SingleFlight[requests.Response]] = None,
+) -> requests.Response:
+    values = mdl.params.get(config.param)
+    if isinstance(values, str) or not isinstance(values, Sequence):
+        values = [] if values is None else [values]
+    base = mdl.copy(
+        update={"params": {k: v for k, v in mdl.params.items() if k != config.param}}
+    )
+    chunks = chunking.split(
+        [value for value in values if value is not None],
+        param=config.param,
+        base_length=len(_build_url(base)),
+        max_url_length=config.max_url_length,
+        max_values=config.max_values,
+    )
+    variants = [
+        mdl.copy(
+            update={"params": {**mdl.params, config.param: chunk}, "chunking": None}
+        )
+        for chunk in chunks
+    ]
+
+    def send(variant: model.RequestFile) -> requests.Response:
+        return _send(
+            session,
+            mdl=variant,
+            url=_build_url(variant),
+            request_file=request_file,
+            args=args,
+            flights=flights,
+        )
+
+    if len(variants) == 1:
+        return send(variants[0])
+    with ThreadPoolExecutor(max_workers=min(args.concurrency, len(variants))) as pool:
+        return chunking.merge(pool.map(send, variants))
+
+
+def _record_run(
+    args: _Arguments, mdl: model.RequestFile, request_file: str, spec: pipeline.Spec
+) -> None:
+    # One entry per run rather than per send, so chunks and failed replicas aren't replayed as extra requests
+    if args.record_replay is None:
+        return
+    if request_file == pipeline.STDIN:
+        request = spec.get(
+            "request", {k: v for k, v in spec.items() if k not in ("id", "replace")}
+        )
+        entry: pipeline.Spec = {"request": request}
+    else:
+        entry = {"file": path.abspath(request_file)}
+    replay.record(args.record_replay, {**entry, "replace": mdl.replaced})
+
+
+def _record_file(request_file: str) -> str:
+    return (
+        request_file if request_file == pipeline.STDIN else path.abspath(request_file)
+    )
+
+
+def _timeout(
+    mdl: model.RequestFile, args: _Arguments
+) -> Tuple[Optional[float], Optional[float]]:
+    return (
+        _first(args.connect_timeout, mdl.connect_timeout),
+        _first(args.read_timeout, mdl.read_timeout),
+    )
+
+
+def _retry_policy(mdl: model.RequestFile, args: _Arguments) -> model.RetryPolicy:
+    if args.retries is None:
+        return mdl.retry
+    return mdl.retry.copy(update={"attempts": args.retries})
+
+
+def _send_once(
+    session: requests.Session,
+    mdl: model.RequestFile,
+    url: str,
+    request_file: str,
+    args: _Arguments,
+    stream: bool = False,
+) -> requests.Response:
+    record = metrics.MetricsRecord(
+        time=time.time(),
+        file=_record_file(request_file),
+        host=urlparse.urlparse(url).netloc,
+        method=mdl.method,
+        status=0,
+        ttfb=0.0,
+        total=0.0,
+        bytes_out=len(mdl.content),
+        bytes_in=0,
+    )
+    headers = mdl.headers
+    encoding = _first(args.compress, mdl.compress)
+    if encoding is not None and mdl.content:
+        headers = {**mdl.headers, "Content-Encoding": encoding.value}
+
+    def body() -> Union[bytes, Iterator[bytes]]:
+        # A new generator for every attempt, since each one is consumed as it is sent
+        if encoding is None or not mdl.content:
+            return mdl.content
+        return compression.compress(mdl.content, encoding.value)
+
+    start = time.perf_counter()
+    try:
+        res = retry.send(
+            lambda: session.request(
+                method=mdl.method,
+                url=url,
+                headers=headers,
+                data=body(),
+                allow_redirects=args.allow_redirects,
+                stream=stream or args.max_memory is not None,
+                timeout=_timeout(mdl, args),
+            ),
+            method=mdl.method,
+            policy=_retry_policy(mdl, args),
+            hedge=_first(args.hedge, mdl.hedge),
+        )
+    except requests.RequestException:
+        record.total = time.perf_counter() - start
+        metrics.append_record(record, path=_metrics_path)
+        raise
+    if args.max_memory is not None and not stream:
+        spool.read(res, max_memory=args.max_memory)
+    record.status = res.status_code
+    record.ttfb = res.elapsed.total_seconds()
+    record.total = time.perf_counter() - start
+    # Don't download a streamed body just to measure it
+    record.bytes_in = (
+        int(res.headers.get("content-length", 0)) if stream else len(res.content)
+    )
+    metrics.append_record(record, path=_metrics_path)
+    return res
+
+
+def _download(
+    session: requests.Session,
+    mdl: model.RequestFile,
+    url: str,
+    request_file: str,
+    args: _Arguments,
+) -> bool:
+    output_file, *other_output_files = args.output_files
+    record = metrics.MetricsRecord(
+        time=time.time(),
+        file=_record_file(request_file),
+        host=urlparse.urlparse(url).netloc,
+        method=mdl.method,
+        status=0,
+        ttfb=0.0,
+        total=0.0,
+        bytes_out=0,
+        bytes_in=0,
+    )
+    start = time.perf_counter()
+    try:
+        downloaded = download.download(
+            session,
+            url=url,
+            headers=mdl.headers,
+            path=output_file,
+            segments=args.segments,
+            timeout=_timeout(mdl, args),
+            policy=_retry_policy(mdl, args),
+        )
+    except (download.DownloadError, requests.RequestException) as exc:
+        record.status = getattr(exc, "status", 0)
+        record.total = time.perf_counter() - start
+        metrics.append_record(record, path=_metrics_path)
+        print(f"fatal: download: {exc}", file=stderr)
+        exit(1)
+    if downloaded is None:
+        return False
+    for other_output_file in other_output_files:
+        copyfile(output_file, other_output_file)
+    record.status = downloaded.status
+    record.total = time.perf_counter() - start
+    record.bytes_in = downloaded.length
+    metrics.append_record(record, path=_metrics_path)
+    print(f"download: saved {downloaded.length} bytes to {output_file}", file=stderr)
+    return True
+
+
+def _write_lines(fp: BinaryIO, lines: Iterable[Union[str, bytes]]) -> None:
+    for line in lines:
+        fp.write(line.encode("utf-8") if isinstance(line, str) else line)
+        fp.write(b"\n")
+
+
+def _emit(
+    lines: Iterable[Union[str, bytes]],
+    exports: Dict[str, str],
+    args: _Arguments,
+) -> None:
+    # Output response
+    for export_file in args.output_files:
+        with open(export_file, "wb") as fp:
+            _write_lines(fp, lines)
+    sys.stdout.flush()
+    _write_lines(sys.stdout.buffer, lines)
+    sys.stdout.buffer.flush()
+
+    _emit_exports(exports, args=args)
+
+
+def _emit_exports(exports: Dict[str, str], args: _Arguments) -> None:
+    # Output environment exports
+    for export_key, export_value in exports.items():
+        environ[export_key] = export_value
+        _exported_vars[export_key] = export_value
+
+    write_exports(exports.items(), path=_env_path)
+    if args.exports_files:
+        for export_file in args.exports_files:
+            write_exports(exports.items(), path=export_file)
+    if args.print_exports:
+        for export_key, export_value in exports.items():
+            print(write_var(export_key, export_value))
+
+
+def _output(
+    res: requests.Response, mdl: model.RequestFile, args: _Arguments, env_prefix: str
+) -> Tuple[List[Union[str, bytes]], Dict[str, str]]:
+    lines = list(format(res=res, mdl=mdl, format=args.format))
+    exports = dict(get_exports(res=res, mdl=mdl, prefix=env_prefix))
+    _emit(lines, exports=exports, args=args)
+    return lines, exports
+
+
+def _output_events(
+    res: requests.Response, mdl: model.RequestFile, args: _Arguments, env_prefix: str
+) -> None:
+    until = _first(args.until, mdl.until)
+    outputs = [open(output_file, "wb") for output_file in args.output_files]
+    try:
+        for fp in [*outputs, sys.stdout.buffer]:
+            _write_lines(fp, events.format_head(res, format=args.format))
+        for event in events.iter_events(res):
+            lines = list(events.format_event(event, format=args.format))
+            for fp in [*outputs, sys.stdout.buffer]:
+                _write_lines(fp, lines)
+                fp.flush()
+            exports = dict(
+                events.get_exports(event, res=res, mdl=mdl, prefix=env_prefix)
+            )
+            if exports:
+                _emit_exports(exports, args=args)
+            if until is not None and events.matches(event, res=res, pathspec=until):
+                break
+    finally:
+        for fp in outputs:
+            fp.close()
+
+
+def _replay(
+    entry: cache.CacheEntry,
+    mdl: model.RequestFile,
+    url: str,
+    request_file: str,
+    args: _Arguments,
+) -> None:
+    print(f"cache: {request_file} is up to date", file=stderr)
+    _emit(entry.output, exports=entry.exports, args=args)
+    metrics.append_record(
+        metrics.MetricsRecord(
+            time=time.time(),
+            file=_record_file(request_file),
+            host=urlparse.urlparse(url).netloc,
+            method=mdl.method,
+            status=entry.status,
+            ttfb=0.0,
+            total=0.0,
+            bytes_out=0,
+            bytes_in=0,
+            cache="hit",
+        ),
+        path=_metrics_path,
+    )
+
+
+def _session(args: _Arguments) -> requests.Session:
+    session = requests.Session()
+    # Allow every concurrent request to keep its connection alive
+    pool_size = max(args.concurrency, requests.adapters.DEFAULT_POOLSIZE)
+    if args.adaptive:
+        controller = adaptive.Controller(max_limit=args.concurrency)
+        http_adapter: Callable[..., requests.adapters.HTTPAdapter] = partial(
+            adaptive.AdaptiveHTTPAdapter, controller
+        )
+        unix_adapter: Callable[..., unix.UnixAdapter] = partial(
+            adaptive.AdaptiveUnixAdapter, controller
+        )
+    else:
+        http_adapter = requests.adapters.HTTPAdapter
+        unix_adapter = unix.UnixAdapter
+    session.mount("https://", http_adapter(pool_maxsize=pool_size))
+    session.mount("http://", http_adapter(pool_maxsize=pool_size))
+    session.mount(f"{unix.SCHEME}://", unix_adapter(pool_maxsize=pool_size))
+    if args.unix_socket:
+        session.mount(
+            "http://",
+            unix_adapter(socket_path=args.unix_socket, pool_maxsize=pool_size),
+        )
+    return session
+
+
+def _execute_spec(
+    session: requests.Session,
+    spec: pipeline.Spec,
+    args: _Arguments,
+    namespace: str,
+    flights: Optional[coalesce.SingleFlight[requests.Response]] = None,
+) -> pipeline.Result:
+    replace = spec.get("replace", {})
+    if not isinstance(replace, dict):
+        raise ValueError("replace must be an object")
+    if "file" in spec:
+        request_file = spec["file"]
+        mdl = _load_model(request_file)
+    else:
+        request_file = pipeline.STDIN
+        mdl = model.RequestFile(**spec.get("request", spec))
+    mdl = _resolve(
+        mdl,
+        replacements={key: str(value) for key, value in replace.items()},
+        namespace=namespace,
+        no_prompt=True,
+    )
+    url = _build_url(mdl)
+    _record_run(args, mdl=mdl, request_file=request_file, spec=spec)
+    res = _send(
+        session,
+        mdl=mdl,
+        url=url,
+        request_file=request_file,
+        args=args,
+        flights=flights,
+    )
+    spool.warn_in_memory(res, "--stdin")
+    try:
+        body = codec.loads(res.content)
+    except ValueError:
+        body = res.text
+    env_prefix = f"{namespace}_" if namespace else ""
+    return {
+        "url": url,
+        "status": res.status_code,
+        "elapsed": res.elapsed.total_seconds(),
+        "body": body,
+        "exports": dict(get_exports(res=res, mdl=mdl, prefix=env_prefix)),
+    }
+
+
+def _run_stdin(session: requests.Session, args: _Arguments, namespace: str) -> None:
+    def emit(result: pipeline.Result) -> None:
+        sys.stdout.buffer.write(codec.dumps(result) + b"\n")
+        sys.stdout.buffer.flush()
+
+    flights: coalesce.SingleFlight[requests.Response] = coalesce.SingleFlight()
+    pipeline.run(
+        stdin,
+        execute=lambda spec: _execute_spec(
+            session, spec, args=args, namespace=namespace, flights=flights
+        ),
+        emit=emit,
+        concurrency=args.concurrency,
+    )
+
+
+def _run_file(
+    session: requests.Session,
+    request_file: str,
+    args: _Arguments,
+    replacements: Dict[str, str],
+    namespace: str,
+    flights: Optional[coalesce.SingleFlight[requests.Response]] = None,
+) -> None:
+    env_prefix = f"{namespace}_" if namespace else ""
+    try:
+        mdl = _resolve(
+            _load_model(request_file),
+            replacements=replacements,
+            namespace=namespace,
+            no_prompt=args.no_prompt,
+        )
+    except ValueError as exc:
+        print(f"fatal: {exc}", file=stderr)
+        exit(1)
+    url = _build_url(mdl)
+
+    # cURL
+    if args.print_curl:
+        header_string = " ".join(
+            f"-H '{key}: {value}'" for key, value in mdl.headers.items()
+        )
+
+        print(f"curl -X {mdl.method} {header_string} -d '{mdl.body}' -L '{url}'")
+
+    if not args.dry_run:
+        if args.if_stale:
+            inputs = cache.input_hash(request_file, mdl, args.format.value, env_prefix)
+            entry = cache.load(_cache_dir, request_file, namespace)
+            if entry is not None and entry.is_fresh(inputs):
+                _replay(entry, mdl=mdl, url=url, request_file=request_file, args=args)
+                return
+
+        _record_run(args, mdl=mdl, request_file=request_file, spec={})
+
+        # Exports and formatting need the body in memory, so only raw downloads can be segmented
+        if (
+            args.segments > 1
+            and args.output_files
+            and mdl.method.upper() == "GET"
+            and not mdl.exports
+            and _download(
+                session, mdl=mdl, url=url, request_file=request_file, args=args
+            )
+        ):
+            return
+        # With no body output, the body is only downloaded as far as the exports need
+        stream = args.format == Format.NONE and not args.if_stale and can_stream(mdl)
+        stream_events = (
+            args.format != Format.REQUESTS_MOCK
+            and not args.if_stale
+            and (
+                _first(args.until, mdl.until) is not None or events.accepts_events(mdl)
+            )
+        )
+        # Saving the body as received means reading it before requests decodes it
+        keep_encoding = (
+            args.keep_encoding and bool(args.output_files) and mdl.chunking is None
+        )
+        if keep_encoding and "accept-encoding" not in {k.lower() for k in mdl.headers}:
+            mdl = mdl.copy(
+                update={
+                    "headers": {
+                        **mdl.headers,
+                        "Accept-Encoding": compression.ACCEPT_ENCODING,
+                    }
+                }
+            )
+        output_args = args
+        if mdl.chunking is not None:
+            try:
+                res = _send(
+                    session,
+                    mdl=mdl,
+                    url=url,
+                    request_file=request_file,
+                    args=args,
+                    flights=flights,
+                )
+            except ValueError as exc:
+                print(f"fatal: {exc}", file=stderr)
+                exit(1)
+            stream = False
+        else:
+            res = _send(
+                session,
+                mdl=mdl,
+                url=url,
+                request_file=request_file,
+                args=args,
+                flights=flights,
+                stream=stream or stream_events or keep_encoding,
+            )
+            # Event streams may never end, so they are printed as they arrive and never cached
+            if stream_events and events.is_event_stream(res):
+                try:
+                    _output_events(res, mdl=mdl, args=args, env_prefix=env_prefix)
+                finally:
+                    res.close()
+                return
+            # Not an event stream after all, so its body is read like any other
+            if (
+                stream_events
+                and not stream
+                and not keep_encoding
+                and args.max_memory is not None
+            ):
+                spool.read(res, max_memory=args.max_memory)
+            stream = stream or stream_events or keep_encoding
+            if keep_encoding:
+                try:
+                    compression.save_raw(
+                        res, args.output_files, max_memory=args.max_memory
+                    )
+                except ValueError as exc:
+                    print(f"fatal: {exc}", file=stderr)
+                    exit(1)
+                finally:
+                    res.close()
+                output_args = dataclasses.replace(args, output_files=[])
+        try:
+            lines, exports = _output(
+                res, mdl=mdl, args=output_args, env_prefix=env_prefix
+            )
+        finally:
+            if stream:
+                res.close()
+
+        if args.if_stale and res.ok and spool.is_spooled(res):
+            print(
+                f"cache: not saving {request_file}: its body was spooled to disk",
+                file=stderr,
+            )
+        elif args.if_stale and res.ok:
+            ttl = get_ttl(res, mdl)
+            cache.save(
+                _cache_dir,
+                request_file,
+                namespace,
+                cache.CacheEntry(
+                    inputs=inputs,
+                    status=res.status_code,
+                    output=[
+                        line if isinstance(line, str) else str(line, "utf-8")
+                        for line in lines
+                    ],
+                    exports=exports,
+                    expires=time.time() + ttl if ttl is not None else None,
+                ),
+            )
+
+
+def _run_file_namespaces(
+    session: requests.Session,
+    request_file: str,
+    args: _Arguments,
+    replacements: Dict[str, str],
+    namespaces: List[str],
+) -> None:
+    # Resolve every variant first, since resolving may prompt for values
+    variants: List[Tuple[str, model.RequestFile, str]] = []
+    for namespace in namespaces:
+        try:
+            mdl = _resolve(
+                _load_model(request_file),
+                replacements=replacements,
+                namespace=namespace,
+                no_prompt=args.no_prompt,
+            )
+        except ValueError as exc:
+            print(f"fatal: {namespace}: {exc}", file=stderr)
+            exit(1)
+        variants.append((namespace, mdl, _build_url(mdl)))
+
+    if args.print_curl:
+        for namespace, mdl, url in variants:
+            header_string = " ".join(
+                f"-H '{key}: {value}'" for key, value in mdl.headers.items()
+            )
+            print(
+                f"# {namespace}\ncurl -X {mdl.method} {header_string} -d '{mdl.body}' -L '{url}'"
+            )
+    if args.dry_run:
+        return
+
+    def send(variant: Tuple[str, model.RequestFile, str]) -> requests.Response:
+        _, mdl, url = variant
+        _record_run(args, mdl=mdl, request_file=request_file, spec={})
+        return _send(session, mdl=mdl, url=url, request_file=request_file, args=args)
+
+    rows: List[Tuple[str, str, str, str]] = []
+    hashes = set()
+    with ThreadPoolExecutor(max_workers=min(args.concurrency, len(variants))) as pool:
+        futures = [pool.submit(send, variant) for variant in variants]
+        for (namespace, mdl, _), future in zip(variants, futures):
+            try:
+                res = future.result()
+            except (ValueError, requests.RequestException) as exc:
+                rows.append((namespace, "error", "-", str(exc)))
+                continue
+            body_hash = hashlib.sha256(res.content).hexdigest()[:16]
+            hashes.add(body_hash)
+            rows.append(
+                (
+                    namespace,
+                    f"{res.status_code} {res.reason}",
+                    f"{res.elapsed.total_seconds() * 1000:.1f}ms",
+                    body_hash,
+                )
+            )
+
+            # Exports are written per namespace, the same as running with REQUESTFILE_NAMESPACE
+            env_prefix = f"{namespace}_" if namespace else ""
+            exports = dict(get_exports(res=res, mdl=mdl, prefix=env_prefix))
+            _emit_exports(exports, args=args)
+
+    header = ("namespace", "status", "latency", "body")
+    widths = [max(len(row[col]) for row in [header, *rows]) for col in range(3)]
+    print(f"# {request_file}")
+    for row in [header, *rows]:
+        print("  ".join([*(v.ljust(w) for v, w in zip(row, widths)), row[3]]))
+    if len(hashes) > 1:
+        print(f"namespaces: {request_file}: response bodies differ", file=stderr)
+
+
+def _run(
+    session: requests.Session, args: _Arguments, replacements: Dict[str, str]
+) -> None:
+    # Env import
+    _import_env(args.imports_files)
+
+    # Resolve var namespace
+    namespace = environ.get("REQUESTFILE_NAMESPACE", "")
+
+    # Identical safe requests which are in flight at once, such as chunks, are only sent once. Files run one after
+    # another, so a later file always sees the effect of an earlier one
+    flights: coalesce.SingleFlight[requests.Response] = coalesce.SingleFlight()
+    for request_file in args.files:
+        if args.namespaces:
+            _run_file_namespaces(
+                session,
+                request_file,
+                args=args,
+                replacements=replacements,
+                namespaces=args.namespaces,
+            )
+            continue
+        _run_file(
+            session,
+            request_file,
+            args=args,
+            replacements=replacements,
+            namespace=namespace,
+            flights=flights,
+        )
+
+
+def _watch(
+    session: requests.Session, args: _Arguments, replacements: Dict[str, str]
+) -> None:
+    def run() -> None:
+        try:
+            _run(session, args=args, replacements=replacements)
+        except (OSError, ValueError, requests.RequestException) as exc:
+            # Keep watching; the file is probably mid-edit or the server is restarting
+            print(f"watch: error: {exc}", file=stderr)
+        except SystemExit:
+            # Fatal for a single run, but the reason has already been printed
+            print("watch: error: run failed", file=stderr)
+
+    run()
+    paths = [*args.files, *args.imports_files]
+    print(f"watch: watching {len(paths)} file(s) for changes", file=stderr)
+    for changed in watch.changes(paths):
+        print(f"watch: changed: {', '.join(sorted(changed))}", file=stderr)
+        run()
+
+
+def _poll(
+    session: requests.Session, args: _Arguments, replacements: Dict[str, str]
+) -> None:
+    _import_env(args.imports_files)
+    namespace = environ.get("REQUESTFILE_NAMESPACE", "")
+    env_prefix = f"{namespace}_" if namespace else ""
+
+    # Resolve once up front, since resolving may prompt for values
+    targets: List[Tuple[str, model.RequestFile, str, poll.PollState]] = []
+    for request_file in args.files:
+        try:
+            mdl = _resolve(
+                _load_model(request_file),
+                replacements=replacements,
+                namespace=namespace,
+                no_prompt=args.no_prompt,
+            )
+        except ValueError as exc:
+            print(f"fatal: {exc}", file=stderr)
+            exit(1)
+        targets.append(
+            (request_file, mdl, _build_url(mdl), poll.PollState(args.compare))
+        )
+
+    errors = 0
+    while True:
+        failed = False
+        for request_file, mdl, url, state in targets:
+            # Revalidate against the last response, so unchanged bodies aren't sent again. Merged chunks have
+            # no validators of their own, so they are always sent in full
+            conditional = (
+                mdl
+                if mdl.chunking is not None
+                else mdl.copy(
+                    update={"headers": state.conditional_headers(mdl.headers)}
+                )
+            )
+            _record_run(args, mdl=mdl, request_file=request_file, spec={})
+            try:
+                res = _send(
+                    session,
+                    mdl=conditional,
+                    url=url,
+                    request_file=request_file,
+                    args=args,
+                )
+            except (ValueError, requests.RequestException) as exc:
+                print(f"poll: error: {exc}", file=stderr)
+                failed = True
+                continue
+            failed = failed or res.status_code >= 500
+            if state.update(res):
+                _output(res, mdl=mdl, args=args, env_prefix=env_prefix)
+        errors = errors + 1 if failed else 0
+        time.sleep(poll.next_delay(args.every, errors))
+
+
+def _parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        epilog="JSON is read and written with orjson or ujson when installed. Set REQUESTFILE_JSON to json, ujson or orjson to choose one."
+    )
     parser.add_argument(
         "files",
         type=str,
-        nargs="+",
+        nargs="*",
         help="JSON files which follow the Request File schema.",
     )
     parser.add_argument(
@@ -188,137 +1228,191 @@ def main(*argv: str) -> None:
         action="store_false",
         help="Do not automatically resolve redirects.",
     )
-    args = _Arguments(**vars(parser.parse_args(argv[1:])))
-    replacements = {key: value for key, value in args.replacements}
-
-    # Env import
-    for import_file in args.imports_files:
-        with open(import_file, "r") as fp:
-            for line in fp:
-                try:
-                    import_key, import_value = read_var(line)
-                except ValueError:
-                    continue
-                environ[import_key] = import_value
-
-    # Resolve var namespace
-    namespace = environ.get("REQUESTFILE_NAMESPACE", "")
-    env_prefix = namespace
-    if env_prefix:
-        env_prefix += "_"
+    parser.add_argument(
+        "-w",
+        "--watch",
+        dest="watch",
+        default=False,
+        action="store_true",
+        help="Keep running and re-send the requests whenever the request files or imports files change.",
+    )
+    parser.add_argument(
+        "--segments",
+        dest="segments",
+        default=0,
+        type=int,
+        help="Download GET responses to the first --output file as this many concurrent byte range requests, resuming interrupted downloads. The raw body is saved and nothing is printed. Falls back to a single request if the server does not support ranges.",
+        metavar="<n>",
+    )
+    parser.add_argument(
+        "--unix-socket",
+        dest="unix_socket",
+        default=None,
+        help="Send http:// requests over this Unix domain socket instead of TCP. Alternatively, use an http+unix:// URL with the percent-encoded socket path as the host.",
+        metavar="<path>",
+    )
+    parser.add_argument(
+        "--if-stale",
+        dest="if_stale",
+        default=False,
+        action="store_true",
+        help="Skip request files whose content, replacement values and exports ttl are unchanged since they last succeeded, and replay the saved output and exports instead.",
+    )
+    parser.add_argument(
+        "--stdin",
+        dest="stdin",
+        default=False,
+        action="store_true",
+        help='Read request specs from stdin as JSON lines and write the results to stdout as JSON lines. Each spec is either {"file": <path>, "replace": {<name>: <value>}}, {"request": <request file>, "replace": ...} or a request file.',
+    )
+    parser.add_argument(
+        "--concurrency",
+        dest="concurrency",
+        default=10,
+        type=int,
+        help="Maximum number of requests in flight at once when sending many requests.",
+        metavar="<n>",
+    )
+    parser.add_argument(
+        "--adaptive",
+        dest="adaptive",
+        default=False,
+        action="store_true",
+        help="Adapt the number of requests in flight, up to --concurrency, to the latency and errors of the target, honour Retry-After and stop sending to hosts which keep failing.",
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        dest="connect_timeout",
+        default=None,
+        type=parse_duration,
+        help="How long to wait for a connection to be made, e.g. 5s. Overrides the request file.",
+        metavar="<duration>",
+    )
+    parser.add_argument(
+        "--read-timeout",
+        dest="read_timeout",
+        default=None,
+        type=parse_duration,
+        help="How long to wait for the server to send data after connecting, e.g. 30s. Overrides the request file.",
+        metavar="<duration>",
+    )
+    parser.add_argument(
+        "--retries",
+        dest="retries",
+        default=None,
+        type=int,
+        help="How many times to retry failed requests. Overrides the request file.",
+        metavar="<n>",
+    )
+    parser.add_argument(
+        "--duplicate-after",
+        dest="hedge",
+        default=None,
+        type=parse_duration,
+        help="Send a duplicate of idempotent requests which have had no response after this long, e.g. 500ms, and use whichever response arrives first. Overrides the request file.",
+        metavar="<duration>",
+    )
+    parser.add_argument(
+        "--namespaces",
+        dest="namespaces",
+        default=[],
+        type=_parse_namespaces,
+        help="Comma-separated namespaces to send each request file to concurrently instead of REQUESTFILE_NAMESPACE. A summary of the responses is printed instead of the response bodies.",
+        metavar="<namespace>,...",
+    )
+    parser.add_argument(
+        "--every",
+        dest="every",
+        default=None,
+        type=parse_duration,
+        help="Keep running and re-send the requests at this interval, e.g. 5s, only writing the output and exports when the response changes. Failures back off exponentially.",
+        metavar="<duration>",
+    )
+    parser.add_argument(
+        "--compare",
+        dest="compare",
+        action="append",
+        default=[],
+        help="With --every, only treat the response as changed when the value of this pathspec changes, instead of the whole body. Multiple can be specified.",
+        metavar="<pathspec>",
+    )
+    parser.add_argument(
+        "--until",
+        dest="until",
+        default=None,
+        help="Stop reading event stream and NDJSON responses at the first event this pathspec reads a value from which is not empty, false or null. Requests which set --until, or accept text/event-stream or NDJSON, print each event as it arrives. Overrides the request file.",
+        metavar="<pathspec>",
+    )
+    parser.add_argument(
+        "--compress",
+        dest="compress",
+        default=None,
+        choices=[encoding.value for encoding in model.ContentEncoding],
+        type=model.ContentEncoding,
+        help="Compress request bodies with this Content-Encoding as they are sent. Overrides the request file.",
+    )
+    parser.add_argument(
+        "--keep-encoding",
+        dest="keep_encoding",
+        default=False,
+        action="store_true",
+        help="Save the response body to the --output files exactly as it was received, still compressed if the server compressed it, instead of formatted.",
+    )
+    parser.add_argument(
+        "--max-memory",
+        dest="max_memory",
+        default=None,
+        type=parse_size,
+        help="Spool response bodies larger than this, e.g. 256MB, to a temporary file instead of keeping them in memory. This includes bodies saved with --keep-encoding and replies to event stream requests which turn out not to be event streams. Spooled bodies are printed as they were received rather than re-indented, and regex exports read them from disk. JSON exports, --format requests-mock and --stdin still read them into memory, with a warning, and --if-stale doesn't cache them.",
+        metavar="<size>",
+    )
+    parser.add_argument(
+        "--record-replay",
+        dest="record_replay",
+        default=None,
+        help="Append each request file run to this log, with its replacement values, so it can be sent again with request-file replay. The log may hold secrets, so it is created readable only by you.",
+        metavar="<file>",
+    )
+    return parser
 
-    for request_file in args.files:
-        mdl = model.RequestFile.load(request_file)
 
-        # Replacement/substitution
-        for replacement_key, replacement in mdl.replacements.items():
-            # Use explicit argument first
-            input_replacement = replacements.get(replacement.name)
-            is_set = input_replacement is not None
-            # Try to use environment var second
-            if not is_set:
-                input_replacement = environ.get(f"{env_prefix}{replacement.name}")
-                is_set = input_replacement is not None
-            # Use default value third if specified but offer the ability to override it
-            default_value = (
-                replacement.default
-                if replacement.has_default
-                else _input_history.get_last_input(
-                    replacement.name, namespace=namespace
-                )
-            )
-            if not is_set and (replacement.has_default or default_value):
-                if not args.no_prompt:
-                    input_replacement = input(
-                        f"Enter a value for {replacement.name} ({default_value}): "
-                    )
-                if not args.no_prompt and input_replacement:
-                    _input_history.update_input(
-                        replacement.name, input_replacement, namespace=namespace
-                    )
-                else:
-                    input_replacement = default_value
-                is_set = True
-            # If no default specified but the replacement is required, prompt for value
-            if not is_set and replacement.required:
-                if not args.no_prompt:
-                    input_replacement = input(f"Enter a value for {replacement.name}: ")
-                    if input_replacement:
-                        _input_history.update_input(
-                            replacement.name, input_replacement, namespace=namespace
-                        )
-                        is_set = True
-            # If we still haven't got a replacement then leave as-is
-            if not is_set:
-                continue
-            try:
-                parsed = (
-                    model.parse_replacement(value=input_replacement, model=replacement)
-                    if isinstance(input_replacement, str)
-                    else input_replacement
-                )
-            except ValueError as exc:
-                print(f"fatal: {exc}", file=stderr)
-                exit(1)
-            mdl = model.replace(mdl, old=replacement_key, new=parsed)
+def main(*argv: str) -> None:
+    if len(argv) > 1 and argv[1] in _commands:
+        _commands[argv[1]](*argv[1:])
+        return
 
-        qsl = urlparse.parse_qsl(urlparse.urlparse(mdl.url).query)
-        for param, param_value in mdl.params.items():
-            if param_value is None:
-                continue
-            elif isinstance(param_value, str):
-                qsl.append((param, param_value))
-            elif isinstance(param_value, Sequence):
-                for param_subvalue in param_value:
-                    if param_subvalue is None:
-                        continue
-                    qsl.append((param, param_subvalue))
-            else:
-                qsl.append((param, str(param_value)))
-        qs = urlparse.urlencode(qsl)
-        url = urlparse.urljoin(mdl.url, f"?{qs}")
+    _init_history()
+    atexit.register(_save_history)
 
-        # cURL
-        if args.print_curl:
-            header_string = " ".join(
-                f"-H '{key}: {value}'" for key, value in mdl.headers.items()
+    # Arg parsing
+    parser = _parser()
+    args = _Arguments(**vars(parser.parse_args(argv[1:])))
+    if not args.files and not args.stdin:
+        parser.error("at least one file is required unless --stdin is used")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.every is not None:
+        if args.every <= 0:
+            parser.error("--every must be positive")
+        if args.watch or args.stdin or args.namespaces:
+            parser.error(
+                "--every cannot be combined with --watch, --stdin or --namespaces"
             )
+    replacements = {key: value for key, value in args.replacements}
 
-            print(f"curl -X {mdl.method} {header_string} -d '{mdl.body}' -L '{url}'")
-
-        if not args.dry_run:
-            res = requests.request(
-                method=mdl.method,
-                url=url,
-                headers=mdl.headers,
-                data=mdl.body,
-                allow_redirects=args.allow_redirects,
+    with _session(args) as session:
+        if args.every is not None:
+            _poll(session, args=args, replacements=replacements)
+            return
+        if args.stdin:
+            _import_env(args.imports_files)
+            _run_stdin(
+                session, args=args, namespace=environ.get("REQUESTFILE_NAMESPACE", "")
             )
-
-            # Output response
-            for export_file in args.output_files:
-                with open(export_file, "w") as fp:
-                    for format_str in format(res=res, mdl=mdl, format=args.format):
-                        print(format_str, file=fp)
-            for format_str in format(res=res, mdl=mdl, format=args.format):
-                print(format_str)
-
-            # Output environment exports
-            for export_key, export_value in get_exports(
-                res=res, mdl=mdl, prefix=env_prefix
-            ):
-                environ[export_key] = export_value
-                _exported_vars[export_key] = export_value
-
-            save_exports(res=res, mdl=mdl, path=_env_path, prefix=env_prefix)
-            if args.exports_files:
-                for export_file in args.exports_files:
-                    save_exports(res=res, mdl=mdl, path=export_file, prefix=env_prefix)
-            if args.print_exports:
-                for export_key, export_value in get_exports(
-                    res=res, mdl=mdl, prefix=env_prefix
-                ):
-                    print(write_var(export_key, export_value))
+        if args.watch:
+            _watch(session, args=args, replacements=replacements)
+        else:
+            _run(session, args=args, replacements=replacements)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+import json
+import os
+import time
+from argparse import ArgumentParser
+from dataclasses import asdict, dataclass, fields
+from statistics import quantiles
+from sys import stderr
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from request_file.units import parse_duration
+
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass
+class MetricsRecord:
+    time: float
+    file: str
+    host: str
+    method: str
+    status: int
+    ttfb: float
+    total: float
+    bytes_out: int
+    bytes_in: int
+    cache: str = "miss"
+
+
+def append_record(record: MetricsRecord, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as fp:
+        fp.write(json.dumps(asdict(record), separators=(",", ":")))
+        fp.write("\n")
+
+
+def read_records(path: str, since: Optional[float] = None) -> Iterator[MetricsRecord]:
+    names = {field.name for field in fields(MetricsRecord)}
+    try:
+        fp = open(path, "r")
+    except FileNotFoundError:
+        return
+    with fp:
+        for line in fp:
+            try:
+                raw = json.loads(line)
+                record = MetricsRecord(**{k: v for k, v in raw.items() if k in names})
+            except (ValueError, TypeError):
+                continue
+            if since is not None and record.time < since:
+                continue
+            yield record
+
+
+@dataclass
+class Summary:
+    key: str
+    window: float
+    count: int
+    errors: int
+    hits: int
+    bytes_in: int
+    bytes_out: int
+    latency: Dict[int, float]
+
+
+def percentiles(values: List[float]) -> Dict[int, float]:
+    if len(values) == 1:
+        return {p: values[0] for p in PERCENTILES}
+    # quantiles() computes all 99 cut points in a single sort
+    cuts = quantiles(values, n=100, method="inclusive")
+    return {p: cuts[p - 1] for p in PERCENTILES}
+
+
+def summarise(
+    records: Iterable[MetricsRecord], by: str = "file", window: Optional[float] = None
+) -> List[Summary]:
+    groups: Dict[Tuple[str, float], List[MetricsRecord]] = {}
+    for record in records:
+        window_start = record.time - record.time % window if window else 0.0
+        groups.setdefault((getattr(record, by), window_start), []).append(record)
+
+    summaries: List[Summary] = []
+    for (key, window_start), group in sorted(groups.items()):
+        summaries.append(
+            Summary(
+                key=key,
+                window=window_start,
+                count=len(group),
+                errors=sum(
+                    1 for record in group if record.status == 0 or record.status >= 500
+                ),
+                hits=sum(1 for record in group if record.cache == "hit"),
+                bytes_in=sum(record.bytes_in for record in group),
+                bytes_out=sum(record.bytes_out for record in group),
+                latency=percentiles([record.total for record in group]),
+            )
+        )
+    return summaries
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_prometheus(summaries: Iterable[Summary], path: str, by: str = "file") -> None:
+    lines = [
+        "# HELP request_file_latency_seconds Request latency percentiles.",
+        "# TYPE request_file_latency_seconds summary",
+    ]
+    counts: List[str] = []
+    errors: List[str] = []
+    for summary in summaries:
+        label = f'{by}="{_escape_label(summary.key)}"'
+        for p, value in summary.latency.items():
+            lines.append(
+                f'request_file_latency_seconds{{{label},quantile="{p / 100}"}} {value}'
+            )
+        counts.append(f"request_file_requests_total{{{label}}} {summary.count}")
+        errors.append(f"request_file_errors_total{{{label}}} {summary.errors}")
+    lines.extend(["# TYPE request_file_requests_total counter", *counts])
+    lines.extend(["# TYPE request_file_errors_total counter", *errors])
+
+    # The textfile collector may read at any time, so never leave a partial file behind
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as fp:
+        fp.write("\n".join(lines))
+        fp.write("\n")
+    os.replace(tmp_path, path)
+
+
+def main(*argv: str, metrics_path: str) -> None:
+    parser = ArgumentParser(prog="request-file stats")
+    parser.add_argument(
+        "--by",
+        dest="by",
+        default="file",
+        choices=["file", "host"],
+        help="Group metrics by request file or by resolved host.",
+    )
+    parser.add_argument(
+        "--since",
+        dest="since",
+        default=None,
+        type=parse_duration,
+        help="Only include requests made within this duration, e.g. 24h.",
+        metavar="<duration>",
+    )
+    parser.add_argument(
+        "--window",
+        dest="window",
+        default=None,
+        type=parse_duration,
+        help="Split metrics into time windows of this duration, e.g. 1h.",
+        metavar="<duration>",
+    )
+    parser.add_argument(
+        "--prometheus",
+        dest="prometheus_file",
+        default=None,
+        help="Path to a Prometheus textfile-collector file to write.",
+        metavar="<file>",
+    )
+    parser.add_argument(
+        "--metrics",
+        dest="metrics_file",
+        default=metrics_path,
+        help="Path to the metrics file to read.",
+        metavar="<file>",
+    )
+    args = parser.parse_args(argv[1:])
+
+    since = time.time() - args.since if args.since is not None else None
+    summaries = summarise(
+        read_records(args.metrics_file, since=since), by=args.by, window=args.window
+    )
+    if not summaries:
+        print("stats: no metrics recorded", file=stderr)
+
+    for summary in summaries:
+        window = (
+            f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(summary.window))} "
+            if args.window
+            else ""
+        )
+        latency = " ".join(
+            f"p{p}={value * 1000:.1f}ms" for p, value in summary.latency.items()
+        )
+        print(
+            f"{window}{summary.key}: count={summary.count} errors={summary.errors} hits={summary.hits} "
+            f"in={summary.bytes_in}B out={summary.bytes_out}B {latency}"
+        )
+
+    if args.prometheus_file:
+        write_prometheus(summaries, args.prometheus_file, by=args.by)
@@ -1,4 +1,3 @@
-import json
 from enum import Enum
 from typing import (
     Any,
@@ -17,9 +16,11 @@ from typing import (
 )
 from urllib.parse import urlencode
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, PrivateAttr, validator
 from requests.models import CaseInsensitiveDict as _CaseInsensitiveDict
 
+from request_file import codec
+
 
 def _parse_bool(val: str) -> bool:
     if val.lower() in ("true", "1"):
@@ -50,6 +51,46 @@ class Replacement(BaseModel):
         return "default" in self.__fields_set__
 
 
+class ContentEncoding(str, Enum):
+    GZIP = "gzip"
+    DEFLATE = "deflate"
+
+
+class RetryPolicy(BaseModel):
+    attempts: int = Field(
+        0, description="How many times to retry a failed request; 0 disables retries."
+    )
+    statuses: List[int] = Field(
+        [429, 502, 503, 504],
+        description="Response status codes which should be retried.",
+    )
+    backoff: float = Field(
+        0.5,
+        description="The base delay in seconds between retries, which doubles for every attempt and is jittered.",
+    )
+    max_backoff: float = Field(
+        30.0, description="The maximum delay in seconds between retries."
+    )
+    methods: List[str] = Field(
+        ["GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"],
+        description="Request methods which are safe to send more than once. Other methods are only retried if the request could not be sent at all.",
+    )
+
+
+class Chunking(BaseModel):
+    param: str = Field(
+        ..., description="The list-valued query parameter to split across requests."
+    )
+    max_url_length: Optional[int] = Field(
+        None,
+        description="Split the parameter's values so that no request URL is longer than this.",
+    )
+    max_values: Optional[int] = Field(
+        None,
+        description="Split the parameter's values so that no request has more than this many of them.",
+    )
+
+
 # Unlike the one in requests, this one can be JSON serialised
 T = TypeVar("T")
 
@@ -65,8 +106,11 @@ class RequestFile(BaseModel):
     )
     url: str = Field(
         ...,
-        description="Where to send the request, including any query string and anchor.",
-        examples=["https://myapi.net/api/v1/cat/:name?query={{QUERY}}#{{ANCHOR}}"],
+        description="Where to send the request, including any query string and anchor. Unix domain sockets can be used with the http+unix scheme and the percent-encoded socket path as the host.",
+        examples=[
+            "https://myapi.net/api/v1/cat/:name?query={{QUERY}}#{{ANCHOR}}",
+            "http+unix://%2Frun%2Fmyapi.sock/api/v1/health",
+        ],
     )
     method: str = Field(
         "GET",
@@ -77,6 +121,11 @@ class RequestFile(BaseModel):
         {},
         description="The headers to send for this request. Note that additional auto-generated headers, such as Content-Length and Content-Type, may also be sent.",
     )
+    replicas: List[str] = Field(
+        [],
+        description="Equivalent base URLs to send the request to instead of the scheme, host and port of url. Each request goes to the fastest healthy replica, failing over to the others on connection errors. Entries may hold several comma-separated base URLs, so a replacement can list them per namespace.",
+        examples=[["https://eu.myapi.net", "https://us.myapi.net"], ["{{REPLICAS}}"]],
+    )
     params: Dict[str, Union[str, List[str]]] = Field(
         {},
         description="Query/search parameters for this request. Lists of values are passed as repeated parameters i.e. param=1&param=2.",
@@ -91,9 +140,53 @@ class RequestFile(BaseModel):
         None, alias="json", description="The JSON data of this request, if applicable."
     )
 
+    compress: Optional[ContentEncoding] = Field(
+        None,
+        description="Compress the body with this Content-Encoding as it is sent. The server must accept compressed request bodies.",
+    )
     exports: Dict[str, str] = Field(
         {}, description="Path specs for variables to export from the response."
     )
+    chunking: Optional[Chunking] = Field(
+        None,
+        description="Split a long list of values for a query parameter across several concurrent requests, and merge the JSON array responses into one.",
+    )
+    connect_timeout: Optional[float] = Field(
+        None, description="How many seconds to wait for a connection to be made."
+    )
+    read_timeout: Optional[float] = Field(
+        None,
+        description="How many seconds to wait for the server to send data after connecting.",
+    )
+    retry: RetryPolicy = Field(
+        RetryPolicy(), description="When and how to retry failed requests."
+    )
+    hedge: Optional[float] = Field(
+        None,
+        description="Send a duplicate of this request if there is no response after this many seconds, and use whichever response arrives first. Only applies to methods which are safe to send more than once.",
+    )
+    ttl: Optional[Union[float, str]] = Field(
+        None,
+        description="How long the exports remain valid for when using --if-stale; either a number of seconds, a duration or a path spec to read the number of seconds from the response.",
+        examples=[3600, "30m", "json:.expires_in"],
+    )
+    until: Optional[str] = Field(
+        None,
+        description="For event stream and NDJSON responses, stop reading at the first event this path spec reads a value from which is not empty, false or null.",
+        examples=["json:.status"],
+    )
+
+    # The values the replacements were resolved with, by name, so the request can be resolved again the same way
+    _replaced: Dict[str, str] = PrivateAttr(default_factory=dict)
+
+    @property
+    def replaced(self) -> Dict[str, str]:
+        return self._replaced
+
+    def with_replaced(self, replaced: Dict[str, str]) -> "RequestFile":
+        mdl = self.copy()
+        mdl._replaced = {**self._replaced, **replaced}
+        return mdl
 
     @validator("replacements", pre=True)
     @classmethod
@@ -115,18 +208,22 @@ class RequestFile(BaseModel):
 
     @classmethod
     def load(cls: Type["RequestFile"], path: str) -> "RequestFile":
-        with open(path, "r") as fp:
-            return cls(**json.load(fp))
+        with open(path, "rb") as fp:
+            return cls(**codec.loads(fp.read()))
 
     @property
-    def body(self) -> str:
+    def content(self) -> bytes:
         if self.body_text is not None:
-            return self.body_text
+            return self.body_text.encode("utf-8")
         if self.body_data is not None:
-            return urlencode(self.body_data)
+            return urlencode(self.body_data).encode("utf-8")
         if self.body_json is not None:
-            return json.dumps(self.body_json)
-        return ""
+            return codec.dumps(self.body_json)
+        return b""
+
+    @property
+    def body(self) -> str:
+        return self.content.decode("utf-8")
 
     class Config:
         @staticmethod
@@ -183,9 +280,11 @@ def replace(model: RequestFile, old: str, new: Any) -> RequestFile:
     text = _replace(model.body_text, old=old, new=new)
     form_data = _replace(model.body_data, old=old, new=new)
     json = _replace(model.body_json, old=old, new=new)
+    replicas = _replace(model.replicas, old=old, new=new)
     return model.copy(
         update={
             "url": url,
+            "replicas": replicas,
             "method": method,
             "headers": headers,
             "params": params,
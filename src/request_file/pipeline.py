@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable
+
+from request_file import codec
+
+Spec = Dict[str, Any]
+Result = Dict[str, Any]
+# What inline specs are recorded as instead of a request file
+STDIN = "<stdin>"
+
+
+def _run_one(execute: Callable[[Spec], Result], line_no: int, spec: Spec) -> Result:
+    try:
+        result = execute(spec)
+    except Exception as exc:
+        result = {"error": str(exc) or type(exc).__name__}
+    if "id" in spec:
+        return {"id": spec["id"], "line": line_no, **result}
+    return {"line": line_no, **result}
+
+
+def run(
+    lines: Iterable[str],
+    execute: Callable[[Spec], Result],
+    emit: Callable[[Result], None],
+    concurrency: int,
+) -> None:
+    """
+    Executes a stream of JSON specs with at most concurrency in flight, emitting each result as soon as it completes.
+
+    Input is only read while there is room for another request, so memory use does not depend on the length of the
+    stream. Results are emitted in completion order and carry the line number, and id if given, of their spec.
+    """
+    slots = threading.BoundedSemaphore(concurrency)
+    emit_lock = threading.Lock()
+
+    def done(future: "Future[Result]") -> None:
+        try:
+            with emit_lock:
+                emit(future.result())
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                spec = codec.loads(line)
+                if not isinstance(spec, dict):
+                    raise ValueError("spec must be a JSON object")
+            except ValueError as exc:
+                with emit_lock:
+                    emit({"line": line_no, "error": f"invalid spec: {exc}"})
+                continue
+            slots.acquire()
+            pool.submit(_run_one, execute, line_no, spec).add_done_callback(done)
@@ -0,0 +1,63 @@
+import hashlib
+import random
+from typing import Dict, List, Mapping, Optional
+
+from requests import Response
+
+from request_file import codec
+from request_file.export import read_response_pathspec
+
+# Errors back off exponentially up to this many times the interval
+MAX_BACKOFF_FACTOR = 32
+JITTER = 0.1
+
+
+def next_delay(interval: float, errors: int) -> float:
+    delay = interval * min(2**errors, MAX_BACKOFF_FACTOR)
+    return delay * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+class PollState:
+    """
+    Tracks what was last seen of a polled response, to revalidate it and tell whether it has changed.
+    """
+
+    def __init__(self, pathspecs: Optional[List[str]] = None) -> None:
+        self.pathspecs = pathspecs or []
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.key: Optional[str] = None
+
+    def conditional_headers(self, headers: Mapping[str, str]) -> Dict[str, str]:
+        conditional = dict(headers)
+        if self.etag is not None:
+            conditional["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            conditional["If-Modified-Since"] = self.last_modified
+        return conditional
+
+    def _key(self, res: Response) -> str:
+        digest = hashlib.sha256(str(res.status_code).encode("utf-8"))
+        if not self.pathspecs:
+            digest.update(res.content)
+            return digest.hexdigest()
+        for pathspec in self.pathspecs:
+            try:
+                value = read_response_pathspec(res, pathspec)
+            except Exception as exc:
+                value = f"error: {exc}"
+            digest.update(codec.dumps(value))
+        return digest.hexdigest()
+
+    def update(self, res: Response) -> bool:
+        """
+        Records the response and returns whether it is different from the previous one.
+        """
+        if res.status_code == 304:
+            return False
+        self.etag = res.headers.get("etag")
+        self.last_modified = res.headers.get("last-modified")
+        key = self._key(res)
+        changed = key != self.key
+        self.key = key
+        return changed
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from sys import stderr
+from typing import Callable, Iterable, List, Tuple
+
+from request_file import codec, pipeline
+from request_file.metrics import percentiles
+
+
+@dataclass
+class Outcome:
+    lag: float
+    latency: float
+    status: int
+
+
+def parse_speed(input: str) -> float:
+    """
+    Parses a replay speed such as 2x or 0.5, where 2x sends the requests twice as fast as they were recorded.
+    """
+    text = input.strip().lower()
+    if text.endswith("x"):
+        text = text[:-1]
+    try:
+        speed = float(text)
+    except ValueError:
+        raise ValueError(f"invalid speed: {input}")
+    if speed <= 0:
+        raise ValueError(f"invalid speed: {input}")
+    return speed
+
+
+_record_lock = threading.Lock()
+
+
+def record(path: str, spec: pipeline.Spec) -> None:
+    """
+    Appends a --stdin spec to a log which can be replayed, timed from now. The log holds replacement values, so it is
+    created readable only by the user.
+    """
+    line = codec.dumps({"time": time.time(), **spec}) + b"\n"
+    with _record_lock:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "ab") as fp:
+            fp.write(line)
+
+
+def read_log(paths: Iterable[str]) -> List[Tuple[float, pipeline.Spec]]:
+    """
+    Reads JSON lines with a time, in seconds since the epoch, and a --stdin spec, in order of time, as written by
+    --record-replay.
+    """
+    entries: List[Tuple[float, pipeline.Spec]] = []
+    for path in paths:
+        with open(path, "rb") as fp:
+            for line_no, line in enumerate(fp, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = codec.loads(line)
+                    when = float(entry["time"])
+                except (ValueError, TypeError, KeyError) as exc:
+                    raise ValueError(f"{path}:{line_no}: invalid entry: {exc}")
+                # Metrics have a record per send, e.g. per chunk, and no replacement values, so they can't be replayed
+                if "ttfb" in entry:
+                    raise ValueError(
+                        f"{path}:{line_no}: metrics can't be replayed; record requests with --record-replay"
+                    )
+                del entry["time"]
+                entries.append((when, entry))
+    # Concurrent requests may be logged out of order
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+def schedule(
+    entries: List[Tuple[float, pipeline.Spec]],
+    execute: Callable[[pipeline.Spec], pipeline.Result],
+    speed: float,
+    concurrency: int,
+) -> List[Outcome]:
+    """
+    Executes each spec at its recorded time relative to the first, divided by speed, and returns how late each
+    one started and how long it took.
+
+    Sends are never delayed by earlier responses, only by running out of workers, which shows up as lag.
+    """
+    outcomes: List[Outcome] = []
+    lock = threading.Lock()
+    if not entries:
+        return outcomes
+
+    def run(due: float, spec: pipeline.Spec) -> None:
+        started = time.monotonic()
+        try:
+            status = execute(spec).get("status", 0)
+        except Exception as exc:
+            print(f"replay: error: {exc}", file=stderr)
+            status = 0
+        outcome = Outcome(
+            lag=max(0.0, started - due),
+            latency=time.monotonic() - started,
+            status=status,
+        )
+        with lock:
+            outcomes.append(outcome)
+
+    first = entries[0][0]
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for when, spec in entries:
+            due = start + (when - first) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, due, spec)
+    return outcomes
+
+
+def report(outcomes: List[Outcome]) -> List[str]:
+    if not outcomes:
+        return ["replay: no requests replayed"]
+    errors = sum(1 for o in outcomes if o.status == 0 or o.status >= 500)
+    lag = percentiles([o.lag for o in outcomes])
+    latency = percentiles([o.latency for o in outcomes])
+    return [
+        f"count={len(outcomes)} errors={errors}",
+        "lag: "
+        + " ".join(f"p{p}={value * 1000:.1f}ms" for p, value in lag.items())
+        + f" max={max(o.lag for o in outcomes) * 1000:.1f}ms",
+        "latency: "
+        + " ".join(f"p{p}={value * 1000:.1f}ms" for p, value in latency.items()),
+    ]
+
+
+def parse_args(*argv: str) -> Namespace:
+    parser = ArgumentParser(prog="request-file replay")
+    parser.add_argument(
+        "logs",
+        nargs="+",
+        help='JSON lines files of requests to replay, as written by --record-replay, each a --stdin spec with a "time" in seconds since the epoch.',
+        metavar="<log>",
+    )
+    parser.add_argument(
+        "--speed",
+        dest="speed",
+        default=1.0,
+        type=parse_speed,
+        help="How much faster than recorded to send the requests, e.g. 2x.",
+        metavar="<speed>",
+    )
+    parser.add_argument(
+        "--concurrency",
+        dest="concurrency",
+        default=100,
+        type=int,
+        help="Maximum number of requests in flight at once. Requests which are due while this many are in flight start late.",
+        metavar="<n>",
+    )
+    parser.add_argument(
+        "-i",
+        "--imports",
+        dest="imports_files",
+        action="append",
+        default=[],
+        help="Path to a file where environment variables can be imported from. Multiple can be specified.",
+        metavar="<file>",
+    )
+    args = parser.parse_args(argv[1:])
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    return args
+
+
+def main(args: Namespace, execute: Callable[[pipeline.Spec], pipeline.Result]) -> None:
+    try:
+        entries = read_log(args.logs)
+    except (OSError, ValueError) as exc:
+        print(f"fatal: {exc}", file=stderr)
+        exit(1)
+    outcomes = schedule(
+        entries, execute=execute, speed=args.speed, concurrency=args.concurrency
+    )
+    for line in report(outcomes):
+        print(line)
@@ -0,0 +1,115 @@
+import json
+import os
+import random
+import threading
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib import parse as urlparse
+
+# Weight of each new sample in the moving averages
+ALPHA = 0.3
+# Replicas whose recent requests mostly failed are only tried after the healthy ones
+MAX_ERROR_RATE = 0.5
+# Chance of sending a request to another replica first, so its stats don't go stale
+PROBE_RATE = 0.05
+
+
+@dataclass
+class ReplicaStats:
+    latency: Optional[float] = None
+    error_rate: float = 0.0
+
+
+def split(entries: Iterable[str]) -> List[str]:
+    """
+    Returns the replicas listed in entries, which may each hold several comma-separated base URLs.
+    """
+    return [
+        base.strip().rstrip("/")
+        for entry in entries
+        for base in entry.split(",")
+        if base.strip()
+    ]
+
+
+def rebase(url: str, base: str) -> str:
+    """
+    Returns url with its scheme, host and port replaced by those of base.
+    """
+    parts = urlparse.urlparse(base)
+    return urlparse.urlunparse(
+        urlparse.urlparse(url)._replace(scheme=parts.scheme, netloc=parts.netloc)
+    )
+
+
+class Replicas:
+    """
+    Moving averages of the latency and error rate of each replica, saved as JSON so they carry over between runs.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._stats: Dict[str, ReplicaStats] = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r") as fp:
+                raw = json.load(fp)
+            self._stats = {base: ReplicaStats(**stats) for base, stats in raw.items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            pass
+
+    def get(self, base: str) -> ReplicaStats:
+        with self._lock:
+            return replace(self._stats.get(base, ReplicaStats()))
+
+    def order(self, bases: List[str]) -> List[str]:
+        """
+        Returns bases in the order they should be tried: replicas that have never been tried, then healthy replicas
+        fastest first, then replicas which have never responded or mostly fail, with the fewest errors first.
+        """
+        with self._lock:
+            stats = {base: self._stats.get(base) for base in bases}
+
+        def key(base: str) -> Tuple[int, float]:
+            s = stats[base]
+            if s is None:
+                return (0, 0.0)
+            if s.latency is None or s.error_rate >= MAX_ERROR_RATE:
+                return (2, s.error_rate)
+            return (1, s.latency)
+
+        ordered = sorted(bases, key=key)
+        if len(ordered) > 1 and random.random() < PROBE_RATE:
+            ordered.insert(0, ordered.pop(random.randrange(1, len(ordered))))
+        return ordered
+
+    def record(self, base: str, latency: Optional[float], error: bool) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(base, ReplicaStats())
+            stats.error_rate += ALPHA * (float(error) - stats.error_rate)
+            if latency is not None:
+                stats.latency = (
+                    latency
+                    if stats.latency is None
+                    else stats.latency + ALPHA * (latency - stats.latency)
+                )
+            raw = {base: asdict(stats) for base, stats in self._stats.items()}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as fp:
+                json.dump(raw, fp)
+            os.replace(tmp_path, self.path)
+
+
+_open: Dict[str, Replicas] = {}
+_open_lock = threading.Lock()
+
+
+def load(path: str) -> Replicas:
+    """
+    Returns the stats saved at path, shared by every caller in this process.
+    """
+    with _open_lock:
+        if path not in _open:
+            _open[path] = Replicas(path)
+        return _open[path]
@@ -0,0 +1,110 @@
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+
+from requests import Response
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+from urllib3.exceptions import NewConnectionError
+
+from request_file.adaptive import parse_retry_after
+from request_file.model import RetryPolicy
+
+
+def backoff(attempt: int, policy: RetryPolicy) -> float:
+    # "Full jitter" spreads retries from many clients out instead of synchronising them
+    return random.uniform(0, min(policy.max_backoff, policy.backoff * 2**attempt))
+
+
+def can_resend(exc: Exception, method: str, policy: RetryPolicy) -> bool:
+    """
+    Returns whether a request which failed with exc can safely be sent again: either it could not have reached the
+    server, or its method is one the policy retries.
+    """
+    return method.upper() in {m.upper() for m in policy.methods} or _not_sent(exc)
+
+
+def _not_sent(exc: Exception) -> bool:
+    if isinstance(exc, ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _close(future: "Future[Response]") -> None:
+    if future.exception() is None:
+        future.result().close()
+
+
+def hedged(request: Callable[[], Response], delay: float) -> Response:
+    """
+    Sends the request and, if it has not completed after delay seconds, sends it again, returning whichever
+    succeeds first.
+    """
+    pool = ThreadPoolExecutor(max_workers=2)
+    sent: List["Future[Response]"] = [pool.submit(request)]
+    winner: Optional["Future[Response]"] = None
+    try:
+        done, pending = wait(sent, timeout=delay)
+        if not done:
+            sent.append(pool.submit(request))
+            pending.add(sent[-1])
+        error: Optional[BaseException] = None
+        while pending or done:
+            for future in done:
+                exc = future.exception()
+                if exc is None:
+                    winner = future
+                    return future.result()
+                error = exc
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        assert error is not None
+        raise error
+    finally:
+        # The slower request can't be cancelled, so let it finish in the background and release its connection
+        for future in sent:
+            if future is not winner:
+                future.add_done_callback(_close)
+        pool.shutdown(wait=False)
+
+
+def send(
+    request: Callable[[], Response],
+    method: str,
+    policy: RetryPolicy,
+    hedge: Optional[float] = None,
+) -> Response:
+    """
+    Sends the request, retrying connection errors and retryable statuses with exponential backoff. Requests which
+    may not be idempotent are only retried if they could not have reached the server.
+    """
+    idempotent = method.upper() in {m.upper() for m in policy.methods}
+    attempt_send = (
+        (lambda: hedged(request, hedge))
+        if hedge is not None and idempotent
+        else request
+    )
+    attempt = 0
+    while True:
+        try:
+            res = attempt_send()
+        except (ConnectionError, Timeout) as exc:
+            if attempt >= policy.attempts or not can_resend(exc, method, policy):
+                raise
+            delay = backoff(attempt, policy)
+        else:
+            if (
+                attempt >= policy.attempts
+                or not idempotent
+                or res.status_code not in policy.statuses
+            ):
+                return res
+            retry_after = parse_retry_after(res.headers.get("retry-after"))
+            if retry_after is not None and retry_after > policy.max_backoff:
+                return res
+            delay = max(backoff(attempt, policy), retry_after or 0.0)
+            res.close()
+        attempt += 1
+        time.sleep(delay)
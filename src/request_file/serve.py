@@ -0,0 +1,258 @@
+import json
+import os
+import tempfile
+import threading
+from argparse import ArgumentParser
+from base64 import b64decode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sys import stderr
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib import parse as urlparse
+
+from request_file import codec
+
+Key = Tuple[str, str, str]
+
+# Recorded responses were already decoded and reframed by requests, so these no longer describe the body
+_SKIPPED_HEADERS = {
+    "connection",
+    "content-encoding",
+    "content-length",
+    "transfer-encoding",
+}
+
+
+class Fixture(NamedTuple):
+    status: int
+    reason: str
+    headers: List[Tuple[str, str]]
+    body_path: str
+    length: int
+
+
+def request_key(method: str, url: str) -> Key:
+    """
+    Returns the method, path and sorted query of a URL, so requests match fixtures regardless of host and parameter
+    order.
+    """
+    parts = urlparse.urlsplit(url)
+    query = urlparse.urlencode(
+        sorted(urlparse.parse_qsl(parts.query, keep_blank_values=True))
+    )
+    return method.upper(), urlparse.unquote(parts.path) or "/", query
+
+
+def _body(mock: Dict[str, Any]) -> bytes:
+    if "json" in mock:
+        return codec.dumps(mock["json"])
+    if "text" in mock:
+        return mock["text"].encode("utf-8")
+    if "content" in mock:
+        return b64decode(mock["content"])
+    return b""
+
+
+def _mocks(path: str) -> List[Dict[str, Any]]:
+    with open(path, "rb") as fp:
+        data = codec.loads(fp.read())
+    return data if isinstance(data, list) else [data]
+
+
+def _requests(path: str) -> List[Tuple[int, str, str]]:
+    return [
+        (i, mock.get("method", "GET"), mock["url"])
+        for i, mock in enumerate(_mocks(path))
+        if isinstance(mock, dict) and "url" in mock
+    ]
+
+
+def _load_index(path: Optional[str]) -> Dict[str, Any]:
+    if path is None:
+        return {}
+    try:
+        with open(path, "r") as fp:
+            index = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+    return index if isinstance(index, dict) else {}
+
+
+def _save_index(path: str, index: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump(index, fp)
+    os.replace(tmp_path, path)
+
+
+class Fixtures:
+    """
+    An index of the responses recorded with --format requests-mock in a directory.
+
+    Only the method and URL of each fixture are kept up front. They are saved to index_path, if given, so files which
+    haven't changed since the last run aren't parsed again at startup. A fixture's body is written out to a file the
+    first time it is requested so it can be sent with sendfile from then on.
+    """
+
+    def __init__(self, directory: str, index_path: Optional[str] = None) -> None:
+        self._index: Dict[Key, Tuple[str, int]] = {}
+        self._loaded: Dict[Key, Fixture] = {}
+        self._lock = threading.Lock()
+        self._bodies = tempfile.TemporaryDirectory(prefix="request-file-serve-")
+
+        cached = _load_index(index_path)
+        index: Dict[str, Any] = {}
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                try:
+                    st = os.stat(path)
+                    stamp = [st.st_mtime, st.st_size]
+                    entry = cached.get(path)
+                    if not isinstance(entry, dict) or entry.get("stamp") != stamp:
+                        entry = {"stamp": stamp, "requests": _requests(path)}
+                except (OSError, ValueError) as exc:
+                    print(f"serve: skipping {path}: {exc}", file=stderr)
+                    continue
+                index[path] = entry
+                for i, method, url in entry["requests"]:
+                    key = request_key(method, url)
+                    if key in self._index:
+                        print(f"serve: {path} duplicates {key[0]} {url}", file=stderr)
+                        continue
+                    self._index[key] = (path, i)
+
+        if index_path is not None and index != cached:
+            _save_index(index_path, index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def close(self) -> None:
+        self._bodies.cleanup()
+
+    def get(self, method: str, url: str) -> Optional[Fixture]:
+        key = request_key(method, url)
+        if key[0] == "HEAD" and key not in self._index:
+            key = ("GET", *key[1:])
+        fixture = self._loaded.get(key)
+        if fixture is not None:
+            return fixture
+        if key not in self._index:
+            return None
+        with self._lock:
+            if key not in self._loaded:
+                self._loaded[key] = self._load(key)
+            return self._loaded[key]
+
+    def _load(self, key: Key) -> Fixture:
+        path, i = self._index[key]
+        mock = _mocks(path)[i]
+        body = _body(mock)
+        fd, body_path = tempfile.mkstemp(dir=self._bodies.name)
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(body)
+        headers = [
+            (name, str(value))
+            for name, value in (mock.get("headers") or {}).items()
+            if name.lower() not in _SKIPPED_HEADERS
+        ]
+        return Fixture(
+            status=mock.get("status_code", 200),
+            reason=mock.get("reason") or "",
+            headers=headers,
+            body_path=body_path,
+            length=len(body),
+        )
+
+
+def handler(fixtures: Fixtures) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        # Keep connections alive, so clients can reuse them
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _respond(self) -> None:
+            # Drain any request body so the connection can be reused
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+
+            fixture = fixtures.get(self.command, self.path)
+            if fixture is None:
+                body = f"no fixture for {self.command} {self.path}\n".encode("utf-8")
+                self.send_response(404)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+                return
+
+            self.send_response(fixture.status, fixture.reason or None)
+            for name, value in fixture.headers:
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(fixture.length))
+            self.end_headers()
+            if self.command != "HEAD" and fixture.length:
+                with open(fixture.body_path, "rb") as fp:
+                    self.connection.sendfile(fp)
+
+        do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = (
+            _respond
+        )
+
+    return Handler
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def serve(fixtures: Fixtures, host: str, port: int) -> Server:
+    return Server((host, port), handler(fixtures))
+
+
+def main(*argv: str, index_path: Optional[str] = None) -> None:
+    parser = ArgumentParser(prog="request-file serve")
+    parser.add_argument(
+        "--fixtures",
+        dest="fixtures",
+        required=True,
+        help="Directory of responses recorded with --format requests-mock to serve. Requests are matched on method, path and query.",
+        metavar="<dir>",
+    )
+    parser.add_argument(
+        "--host",
+        dest="host",
+        default="127.0.0.1",
+        help="Address to listen on.",
+        metavar="<host>",
+    )
+    parser.add_argument(
+        "--port",
+        dest="port",
+        default=8080,
+        type=int,
+        help="Port to listen on, or 0 to pick a free one.",
+        metavar="<port>",
+    )
+    args = parser.parse_args(argv[1:])
+
+    fixtures = Fixtures(args.fixtures, index_path=index_path)
+    try:
+        with serve(fixtures, host=args.host, port=args.port) as server:
+            host, port = server.server_address[:2]
+            print(
+                f"serve: serving {len(fixtures)} fixture(s) on http://{host}:{port}",
+                file=stderr,
+            )
+            server.serve_forever()
+    finally:
+        fixtures.close()
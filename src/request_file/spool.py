@@ -0,0 +1,59 @@
+import mmap
+import tempfile
+from sys import stderr
+from typing import Iterable, Optional, Union
+
+from requests import Response
+
+CHUNK_SIZE = 64 * 1024
+
+
+def collect(
+    chunks: Iterable[bytes], max_memory: Optional[int]
+) -> Union[bytes, mmap.mmap]:
+    """
+    Joins chunks into bytes, or into a read-only mmap of a temporary file once they grow past max_memory bytes. The
+    file is deleted once the mmap is closed or collected.
+    """
+    chunks = iter(chunks)
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if max_memory is not None and len(buffer) > max_memory:
+            break
+    else:
+        return bytes(buffer)
+
+    with tempfile.TemporaryFile(prefix="request-file-") as fp:
+        fp.write(buffer)
+        del buffer
+        for chunk in chunks:
+            fp.write(chunk)
+        fp.flush()
+        return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read(res: Response, max_memory: int) -> None:
+    """
+    Reads the body of a streamed response into memory, or into a temporary file once it grows past max_memory bytes.
+
+    A spooled body is left in the response as a read-only mmap of the file, so it can be read like bytes without being
+    held in memory.
+    """
+    res._content = collect(res.iter_content(chunk_size=CHUNK_SIZE), max_memory)
+    res._content_consumed = True
+
+
+def is_spooled(res: Response) -> bool:
+    return isinstance(getattr(res, "_content", None), mmap.mmap)
+
+
+def warn_in_memory(res: Response, reader: str) -> None:
+    """
+    Warns that reader needs the whole body in memory, if it was spooled to keep it out of memory.
+    """
+    if is_spooled(res):
+        print(
+            f"spool: warning: {reader} reads the whole {len(res.content)} byte body into memory",
+            file=stderr,
+        )
@@ -0,0 +1,32 @@
+import re
+
+_duration_re = re.compile(
+    r"^\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h|d)?\s*$", flags=re.IGNORECASE
+)
+_duration_units = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0, "d": 86400.0}
+
+
+def parse_duration(value: str) -> float:
+    """
+    Parses a duration such as 500ms, 5s, 10m, 1h or 7d into seconds; a bare number is taken as seconds.
+    """
+    match = _duration_re.match(value)
+    if not match:
+        raise ValueError(f"invalid duration: {value}")
+    unit = (match.group(2) or "s").lower()
+    return float(match.group(1)) * _duration_units[unit]
+
+
+_size_re = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]i?b?|b)?\s*$", flags=re.IGNORECASE)
+_size_units = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+
+def parse_size(value: str) -> int:
+    """
+    Parses a size such as 512k, 64MB or 2GiB into bytes, counting in powers of 1024; a bare number is taken as bytes.
+    """
+    match = _size_re.match(value)
+    if not match:
+        raise ValueError(f"invalid size: {value}")
+    unit = (match.group(2) or "").lower().rstrip("b").rstrip("i")
+    return int(float(match.group(1)) * _size_units[unit])
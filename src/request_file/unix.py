@@ -0,0 +1,83 @@
+import socket
+from typing import Any, Optional
+from urllib.parse import unquote, urlparse
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3._collections import RecentlyUsedContainer
+
+SCHEME = "http+unix"
+
+
+class UnixHTTPConnection(HTTPConnection):
+    def __init__(self, socket_path: str, *args: Any, **kwargs: Any) -> None:
+        super().__init__("localhost", *args, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+
+class UnixHTTPConnectionPool(HTTPConnectionPool):
+    def __init__(self, socket_path: str, *args: Any, **kwargs: Any) -> None:
+        super().__init__("localhost", *args, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self) -> UnixHTTPConnection:
+        self.num_connections += 1
+        return UnixHTTPConnection(
+            self.socket_path, timeout=self.timeout.connect_timeout
+        )
+
+
+class UnixAdapter(HTTPAdapter):
+    """
+    Sends requests over Unix domain sockets, keeping a connection pool per socket.
+
+    The socket is either given explicitly, in which case every request sent through the adapter uses it, or read from
+    the host of an http+unix:// URL, which is the percent-encoded socket path e.g.
+    http+unix://%2Frun%2Fapp.sock/health.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, **kwargs: Any) -> None:
+        self.socket_path = socket_path
+        super().__init__(**kwargs)
+        self._unix_pools = RecentlyUsedContainer(
+            self._pool_connections, dispose_func=lambda pool: pool.close()
+        )
+
+    def _socket_path(self, url: str) -> str:
+        if self.socket_path is not None:
+            return self.socket_path
+        parsed = urlparse(url)
+        if parsed.scheme != SCHEME or not parsed.netloc:
+            raise ValueError(f"not a {SCHEME}:// URL: {url}")
+        return unquote(parsed.netloc)
+
+    def get_connection(
+        self, url: str, proxies: Optional[Any] = None
+    ) -> UnixHTTPConnectionPool:
+        socket_path = self._socket_path(url)
+        with self._unix_pools.lock:
+            pool = self._unix_pools.get(socket_path)
+            if pool is None:
+                pool = UnixHTTPConnectionPool(socket_path, maxsize=self._pool_maxsize)
+                self._unix_pools[socket_path] = pool
+        return pool
+
+    def get_connection_with_tls_context(
+        self, request: Any, verify: Any, proxies: Optional[Any] = None, cert: Any = None
+    ) -> UnixHTTPConnectionPool:
+        return self.get_connection(request.url, proxies)
+
+    def close(self) -> None:
+        super().close()
+        self._unix_pools.clear()
@@ -0,0 +1,37 @@
+import time
+from os import stat
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+_Stamp = Optional[Tuple[float, int]]
+
+
+def _stamp(path: str) -> _Stamp:
+    try:
+        st = stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+def changes(
+    paths: Iterable[str], interval: float = 0.25, debounce: float = 0.1
+) -> Iterator[Set[str]]:
+    """
+    Polls the given paths and yields the set of paths which changed, once they have stopped changing for the debounce period.
+    """
+    stamps: Dict[str, _Stamp] = {path: _stamp(path) for path in paths}
+    changed: Set[str] = set()
+    last_change = 0.0
+    while True:
+        time.sleep(interval)
+        now = time.monotonic()
+        for path, old in stamps.items():
+            new = _stamp(path)
+            if new != old:
+                stamps[path] = new
+                changed.add(path)
+                last_change = now
+        # Editors often write a file in several steps; wait for them to settle
+        if changed and now - last_change >= debounce:
+            yield changed
+            changed = set()
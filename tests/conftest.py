@@ -1,5 +1,9 @@
 from typing import Set
 
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from py.path import local
+
 _args = {
     "--help",
     "-h",
@@ -19,6 +23,26 @@ _args = {
     "--no-prompt",
     "-n",
     "--ignore-redirects",
+    "--watch",
+    "-w",
+    "--segments",
+    "--unix-socket",
+    "--if-stale",
+    "--stdin",
+    "--concurrency",
+    "--adaptive",
+    "--connect-timeout",
+    "--read-timeout",
+    "--retries",
+    "--duplicate-after",
+    "--namespaces",
+    "--every",
+    "--compare",
+    "--until",
+    "--compress",
+    "--keep-encoding",
+    "--max-memory",
+    "--record-replay",
 }
 
 
@@ -26,3 +50,22 @@ def args(startswith: str = "") -> Set[str]:
     if not startswith:
         return set()
     return {arg for arg in _args if arg.startswith(startswith)}
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmpdir: local, monkeypatch: MonkeyPatch) -> local:
+    from request_file import main
+
+    _dir = tmpdir.mkdir("state")
+    monkeypatch.setattr(main, "_state_dir", _dir.strpath)
+    monkeypatch.setattr(main, "_input_history_path", _dir.join("last-inputs").strpath)
+    monkeypatch.setattr(
+        main, "_readline_history_path", _dir.join("readline-history").strpath
+    )
+    monkeypatch.setattr(main, "_env_path", _dir.join("environment").strpath)
+    monkeypatch.setattr(main, "_metrics_path", _dir.join("metrics").strpath)
+    monkeypatch.setattr(main, "_cache_dir", _dir.join("cache").strpath)
+    monkeypatch.setattr(main, "_check_cache_path", _dir.join("check-cache").strpath)
+    monkeypatch.setattr(main, "_replicas_path", _dir.join("replicas").strpath)
+    monkeypatch.setattr(main, "_serve_index_path", _dir.join("serve-index").strpath)
+    return _dir
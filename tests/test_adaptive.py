@@ -0,0 +1,51 @@
+import pytest
+from request_file import adaptive
+
+
+def test_parse_retry_after() -> None:
+    assert adaptive.parse_retry_after("5") == 5.0
+    assert adaptive.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert adaptive.parse_retry_after("soon") is None
+    assert adaptive.parse_retry_after(None) is None
+
+
+def test_controller_aimd() -> None:
+    controller = adaptive.Controller(max_limit=8)
+    # Slow start doubles the limit every round trip until congestion
+    for _ in range(3):
+        controller.acquire("a")
+        controller.release("a", latency=0.1, status=200)
+    assert controller.limit == 4
+    controller.acquire("a")
+    controller.release("a", latency=0.1, status=429)
+    assert controller.limit == 2
+    # Then increases by one per window
+    controller.acquire("a")
+    controller.release("a", latency=0.1, status=200)
+    assert controller.limit == 2.5
+    # Rising latency is congestion too, but only one decrease is made per round trip
+    controller.acquire("a")
+    controller.release("a", latency=1.0, status=200)
+    assert controller.limit == 2.5
+    # The limit never goes beyond its bounds
+    for _ in range(5):
+        controller.acquire("a")
+        controller.release("a", latency=0.0, status=None)
+    assert controller.limit == 1
+
+
+def test_controller_circuit_breaker() -> None:
+    controller = adaptive.Controller(max_limit=8, failure_threshold=2, cooldown=0)
+    for _ in range(2):
+        controller.acquire("a")
+        controller.release("a", latency=0.1, status=500)
+    # The host is probed once the cooldown ends, but no more until the probe finishes
+    controller.acquire("a")
+    with pytest.raises(adaptive.CircuitOpenError):
+        controller.acquire("a")
+    # Other hosts are unaffected
+    controller.acquire("b")
+    controller.release("b", latency=0.1, status=200)
+    controller.release("a", latency=0.1, status=200)
+    controller.acquire("a")
+    controller.acquire("a")
@@ -0,0 +1,123 @@
+import json
+from typing import List
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from py.path import local
+from request_file import check
+
+
+@pytest.mark.parametrize(
+    ("text", "problems"),
+    [
+        ('{"url": "https://example.com"}', []),
+        (
+            json.dumps(
+                {
+                    "replacements": {"{{REPLICAS}}": {}},
+                    "url": "https://example.com",
+                    "replicas": ["{{REPLICAS}}"],
+                }
+            ),
+            [],
+        ),
+        ("", ["invalid JSON: Expecting value: line 1 column 1 (char 0)"]),
+        ("[]", ["request file must be a JSON object"]),
+        ("{}", ["url: field required"]),
+        (
+            json.dumps(
+                {
+                    "replacements": {"{{ID}}": {}},
+                    "url": "https://example.com/{{ID}}",
+                    "params": {"q": "{{QUERY}}"},
+                }
+            ),
+            ["placeholder '{{QUERY}}' has no replacement"],
+        ),
+        (
+            json.dumps(
+                {
+                    "replacements": {":id": {}, ":id_type": {}, "{{UNUSED}}": {}},
+                    "url": "https://example.com/:id_type/:id",
+                }
+            ),
+            [
+                "replacement ':id' overlaps with replacement ':id_type'",
+                "replacement '{{UNUSED}}' is never used",
+            ],
+        ),
+        (
+            json.dumps(
+                {
+                    "url": "https://example.com",
+                    "exports": {"A": "json:.a", "B": "xml:.b", "C": "json:c"},
+                    "ttl": "soon",
+                }
+            ),
+            [
+                "export 'B': unsupported pathspec type 'xml'; valid values are 'json', 'header', 'status', 'regex'",
+                "export 'C': json pathspec must start with .",
+                "ttl: not a duration and pathspec must start with 'type:' identifier",
+            ],
+        ),
+    ],
+)
+def test_check_text(text: str, problems: List[str]) -> None:
+    assert check.check_text(text) == problems
+
+
+def test_check_cache(tmpdir: local) -> None:
+    files = tmpdir.mkdir("files")
+    good = files / "good.json"
+    good.write('{"url": "https://example.com"}')
+    bad = files / "nested" / "bad.json"
+    bad.write("{}", ensure=True)
+    (files / "ignored.txt").write("")
+    cache_path = (tmpdir / "cache").strpath
+
+    assert dict(check.check([files.strpath], cache_path=cache_path, jobs=1)) == {
+        good.strpath: [],
+        bad.strpath: ["url: field required"],
+    }
+
+    # Unchanged files are not checked again
+    with open(cache_path, "r") as fp:
+        cache = json.load(fp)
+    cache[bad.strpath]["problems"] = ["cached"]
+    with open(cache_path, "w") as fp:
+        json.dump(cache, fp)
+    assert dict(check.check([files.strpath], cache_path=cache_path, jobs=1)) == {
+        good.strpath: [],
+        bad.strpath: ["cached"],
+    }
+
+    # Checking one file keeps the other files' entries, but deleted files are dropped
+    other = tmpdir / "other.json"
+    other.write("{}")
+    list(check.check([good.strpath, other.strpath], cache_path=cache_path, jobs=1))
+    other.remove()
+    list(check.check([good.strpath], cache_path=cache_path, jobs=1))
+    with open(cache_path, "r") as fp:
+        assert set(json.load(fp)) == {good.strpath, bad.strpath}
+
+
+def test_check_cache_salt(tmpdir: local, monkeypatch: MonkeyPatch) -> None:
+    file = tmpdir / "file.json"
+    file.write("{}")
+    cache_path = (tmpdir / "cache").strpath
+    list(check.check([file.strpath], cache_path=cache_path, jobs=1))
+    with open(cache_path, "r") as fp:
+        cache = json.load(fp)
+    cache[file.strpath]["problems"] = ["stale"]
+    with open(cache_path, "w") as fp:
+        json.dump(cache, fp)
+
+    # Results from another version of the checker are not reused
+    check._salt.cache_clear()
+    monkeypatch.setattr(check, "CHECKER_VERSION", check.CHECKER_VERSION + 1)
+    try:
+        assert dict(check.check([file.strpath], cache_path=cache_path, jobs=1)) == {
+            file.strpath: ["url: field required"]
+        }
+    finally:
+        check._salt.cache_clear()
@@ -0,0 +1,64 @@
+import pytest
+import requests
+from request_file import chunking
+from requests_mock import Mocker
+
+
+def test_split_max_values() -> None:
+    assert chunking.split(list("abcde"), "id", base_length=0, max_values=2) == [
+        ["a", "b"],
+        ["c", "d"],
+        ["e"],
+    ]
+
+
+def test_split_max_url_length() -> None:
+    # "https://example.com" plus "?id=a&id=b" is 29 characters
+    base = len("https://example.com")
+    assert chunking.split(list("abc"), "id", base_length=base, max_url_length=29) == [
+        ["a", "b"],
+        ["c"],
+    ]
+    # Encoding is taken into account
+    assert chunking.split(["a b", "&"], "id", base_length=base, max_url_length=30) == [
+        ["a b"],
+        ["&"],
+    ]
+
+
+def test_split_nothing() -> None:
+    assert chunking.split([], "id", base_length=0, max_values=2) == [[]]
+    assert chunking.split(list("abc"), "id", base_length=0) == [["a", "b", "c"]]
+
+
+def test_split_value_too_long() -> None:
+    with pytest.raises(ValueError):
+        chunking.split(["long"], "id", base_length=10, max_url_length=15)
+
+
+def test_merge(requests_mock: Mocker) -> None:
+    requests_mock.get("https://example.com/1", json=[1, 2])
+    requests_mock.get("https://example.com/2", json=[3])
+    merged = chunking.merge(
+        [requests.get("https://example.com/1"), requests.get("https://example.com/2")]
+    )
+    assert merged.status_code == 200
+    assert merged.json() == [1, 2, 3]
+    assert b"".join(merged.iter_content(chunk_size=2)) == b"[1,2,3]"
+    assert list(merged.iter_lines()) == [b"[1,2,3]"]
+
+
+def test_merge_failure(requests_mock: Mocker) -> None:
+    requests_mock.get("https://example.com/1", json=[1, 2])
+    requests_mock.get("https://example.com/2", status_code=500, json={})
+    responses = [
+        requests.get("https://example.com/1"),
+        requests.get("https://example.com/2"),
+    ]
+    assert chunking.merge(responses) is responses[1]
+
+
+def test_merge_not_array(requests_mock: Mocker) -> None:
+    requests_mock.get("https://example.com", json={})
+    with pytest.raises(ValueError):
+        chunking.merge([requests.get("https://example.com")])
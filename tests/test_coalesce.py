@@ -0,0 +1,49 @@
+import threading
+import time
+from typing import List
+
+import pytest
+from request_file import coalesce
+
+
+def test_request_key() -> None:
+    key = coalesce.request_key("get", "https://example.com", {"A": "1"}, b"")
+    assert key == coalesce.request_key("GET", "https://example.com", {"a": "1"}, b"")
+    assert key != coalesce.request_key("GET", "https://example.com", {"a": "2"}, b"")
+    assert key != coalesce.request_key("GET", "https://example.com", {"a": "1"}, b"x")
+
+
+def test_single_flight_concurrent() -> None:
+    flights: coalesce.SingleFlight[int] = coalesce.SingleFlight()
+    calls: List[int] = []
+    results: List[int] = []
+
+    def fn() -> int:
+        calls.append(1)
+        time.sleep(0.05)
+        return 42
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flights.do("key", fn)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [42] * 5
+    # Completed calls are forgotten
+    flights.do("key", fn)
+    assert len(calls) == 2
+
+
+def test_single_flight_error() -> None:
+    flights: coalesce.SingleFlight[int] = coalesce.SingleFlight()
+
+    def fail() -> int:
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        flights.do("key", fail)
+    assert flights.do("key", lambda: 1) == 1
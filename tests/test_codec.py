@@ -0,0 +1,93 @@
+import importlib
+from typing import Any
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from py.path import local
+from request_file import codec
+from request_file.model import RequestFile
+
+_values = [
+    {},
+    [],
+    {"a": [1, 2.5, None, True, False], "b": {"c": {}, "d": []}},
+    {"unicode": "café ☃", "escapes": 'quote " slash / back \\ nl \n'},
+    [{"nested": [[1], [2, [3]]]}],
+    "string",
+    12345678901234,
+]
+_numbers = [
+    1e16,
+    1e-7,
+    0.1,
+    -2.5e300,
+    2**63,
+    2**64,
+    -(2**63) - 1,
+    123456789012345678901234567890,
+    {"id": 123456789012345678901234567890, "price": 19.99},
+]
+
+
+@pytest.mark.parametrize("name", list(codec.codecs))
+@pytest.mark.parametrize("pretty", [False, True])
+@pytest.mark.parametrize("value", _values)
+def test_identical_output(name: str, pretty: bool, value: Any) -> None:
+    expected = codec.codecs["json"].dumps(value, pretty)
+    assert codec.codecs[name].dumps(value, pretty) == expected
+
+
+@pytest.mark.parametrize("name", list(codec.codecs))
+@pytest.mark.parametrize("value", _values)
+def test_round_trip(name: str, value: Any) -> None:
+    _codec = codec.codecs[name]
+    data = _codec.dumps(value, False)
+    assert _codec.loads(data) == value
+    assert _codec.loads(data.decode("utf-8")) == value
+
+
+@pytest.mark.parametrize("name", list(codec.codecs))
+@pytest.mark.parametrize("pretty", [False, True])
+@pytest.mark.parametrize("value", _numbers)
+def test_numbers(name: str, pretty: bool, value: Any) -> None:
+    # Numbers are never lost, though floats may be written differently
+    _codec = codec.codecs[name]
+    data = _codec.dumps(value, pretty)
+    assert codec.codecs["json"].loads(data) == value
+    assert _codec.loads(data) == value
+    assert type(_codec.loads(data)) is type(value)
+    assert _codec.loads(codec.codecs["json"].dumps(value, pretty)) == value
+
+
+@pytest.mark.parametrize("name", list(codec.codecs))
+def test_default(name: str, monkeypatch: MonkeyPatch) -> None:
+    try:
+        # The fastest available codec unless another is chosen
+        fastest = list(codec.codecs)[-1]
+        monkeypatch.delenv("REQUESTFILE_JSON", raising=False)
+        assert importlib.reload(codec).default.name == fastest
+        monkeypatch.setenv("REQUESTFILE_JSON", "unknown")
+        assert importlib.reload(codec).default.name == fastest
+        monkeypatch.setenv("REQUESTFILE_JSON", name)
+        assert importlib.reload(codec).default.name == name
+    finally:
+        monkeypatch.undo()
+        importlib.reload(codec)
+
+
+@pytest.mark.parametrize("name", list(codec.codecs))
+def test_invalid(name: str) -> None:
+    with pytest.raises(ValueError):
+        codec.codecs[name].loads(b"{")
+
+
+@pytest.mark.parametrize("name", list(codec.codecs))
+def test_request_file(name: str, tmpdir: local, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(codec, "default", codec.codecs[name])
+    file = tmpdir / "file.json"
+    file.write(
+        '{"url": "https://example.com", "json": {"id": 123456789012345678901234567890}}'
+    )
+    mdl = RequestFile.load(file.strpath)
+    assert mdl.body_json == {"id": 123456789012345678901234567890}
+    assert mdl.content == b'{"id":123456789012345678901234567890}'
@@ -0,0 +1,24 @@
+import gzip
+import zlib
+
+import pytest
+from request_file import compression
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "deflate"])
+def test_round_trip(encoding: str) -> None:
+    data = b"0123456789" * (compression.CHUNK_SIZE // 3)
+    chunks = list(compression.compress(data, encoding))
+    assert len(chunks) > 1
+    assert sum(len(chunk) for chunk in chunks) < len(data)
+    assert b"".join(compression.decompress(chunks, encoding)) == data
+
+
+def test_decompress() -> None:
+    assert b"".join(compression.decompress([gzip.compress(b"a")], "GZIP")) == b"a"
+    raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    deflated = raw.compress(b"a") + raw.flush()
+    assert b"".join(compression.decompress([deflated], "deflate")) == b"a"
+    assert b"".join(compression.decompress([b"a"], None)) == b"a"
+    with pytest.raises(ValueError):
+        list(compression.decompress([b"a"], "br"))
@@ -0,0 +1,146 @@
+import gzip
+import json
+import re
+from typing import Any, List
+
+import requests
+from py.path import local
+from request_file import download
+from request_file.model import RetryPolicy
+from requests_mock import Mocker
+
+_content = bytes(range(100))
+
+
+def mock_ranges(requests_mock: Mocker, ranges: List[str]) -> None:
+    requests_mock.head(
+        "https://example.com/file",
+        headers={"Accept-Ranges": "bytes", "Content-Length": str(len(_content))},
+    )
+
+    def content(request: Any, context: Any) -> bytes:
+        ranges.append(request.headers["Range"])
+        start, end = re.match(r"bytes=(\d+)-(\d+)", request.headers["Range"]).groups()
+        context.status_code = 206
+        return _content[int(start) : int(end) + 1]
+
+    requests_mock.get("https://example.com/file", content=content)
+
+
+def test_download_timeout(tmpdir: local, requests_mock: Mocker) -> None:
+    mock_ranges(requests_mock, [])
+    with requests.Session() as session:
+        download.download(
+            session,
+            url="https://example.com/file",
+            headers={},
+            path=tmpdir.join("file").strpath,
+            segments=2,
+            timeout=(1.0, 5.0),
+        )
+    assert [req.timeout for req in requests_mock.request_history] == [(1.0, 5.0)] * 3
+
+
+def test_download_retry(tmpdir: local, requests_mock: Mocker) -> None:
+    requests_mock.head(
+        "https://example.com/file",
+        [
+            {"exc": requests.ConnectTimeout},
+            {"headers": {"Accept-Ranges": "bytes", "Content-Length": "2"}},
+        ],
+    )
+    requests_mock.get("https://example.com/file", content=b"ab", status_code=206)
+    with requests.Session() as session:
+        downloaded = download.download(
+            session,
+            url="https://example.com/file",
+            headers={},
+            path=tmpdir.join("file").strpath,
+            segments=1,
+            policy=RetryPolicy(attempts=1, backoff=0),
+        )
+    assert downloaded == (2, 206)
+
+
+def test_split() -> None:
+    assert download.split(10, 3) == [(0, 3), (4, 7), (8, 9)]
+    assert download.split(2, 4) == [(0, 0), (1, 1)]
+
+
+def test_download(tmpdir: local, requests_mock: Mocker) -> None:
+    ranges: List[str] = []
+    mock_ranges(requests_mock, ranges)
+    path = tmpdir.join("file").strpath
+    with requests.Session() as session:
+        downloaded = download.download(
+            session, url="https://example.com/file", headers={}, path=path, segments=4
+        )
+    assert downloaded == (100, 206)
+    assert sorted(ranges) == ["bytes=0-24", "bytes=25-49", "bytes=50-74", "bytes=75-99"]
+    assert tmpdir.join("file").read_binary() == _content
+    assert not tmpdir.join("file.progress").exists()
+
+
+def test_download_resume(tmpdir: local, requests_mock: Mocker) -> None:
+    ranges: List[str] = []
+    mock_ranges(requests_mock, ranges)
+    file = tmpdir.join("file")
+    file.write_binary(_content[:60] + bytes(40))
+    tmpdir.join("file.progress").write(
+        json.dumps(
+            {
+                "url": "https://example.com/file",
+                "length": 100,
+                "etag": None,
+                "ranges": [[0, 49], [50, 99]],
+                "written": [50, 10],
+            }
+        )
+    )
+    with requests.Session() as session:
+        download.download(
+            session,
+            url="https://example.com/file",
+            headers={},
+            path=file.strpath,
+            segments=2,
+        )
+    assert ranges == ["bytes=60-99"]
+    assert file.read_binary() == _content
+
+
+def test_download_unsupported(tmpdir: local, requests_mock: Mocker) -> None:
+    requests_mock.head("https://example.com/file", headers={"Content-Length": "100"})
+    with requests.Session() as session:
+        assert (
+            download.download(
+                session,
+                url="https://example.com/file",
+                headers={},
+                path=tmpdir.join("file").strpath,
+                segments=2,
+            )
+            is None
+        )
+
+
+def test_download_compressed(tmpdir: local, requests_mock: Mocker) -> None:
+    body = gzip.compress(_content)
+    requests_mock.head(
+        "https://example.com/file",
+        headers={"Accept-Ranges": "bytes", "Content-Length": str(len(body))},
+    )
+    mocker = requests_mock.get(
+        "https://example.com/file",
+        status_code=206,
+        headers={"Content-Encoding": "gzip"},
+        content=body,
+    )
+    path = tmpdir.join("file").strpath
+    with requests.Session() as session:
+        download.download(
+            session, url="https://example.com/file", headers={}, path=path, segments=1
+        )
+    # Saved as sent, so offsets line up with the ranges that were requested
+    assert tmpdir.join("file").read_binary() == body
+    assert mocker.last_request.headers["Accept-Encoding"] == "identity"
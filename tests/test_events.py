@@ -0,0 +1,86 @@
+import gzip
+import io
+
+
+from request_file import events
+from request_file.format import Format
+from request_file.model import RequestFile
+from requests import Response
+
+
+def _response(content_type: str, body: bytes) -> Response:
+    res = Response()
+    res.status_code = 200
+    res.headers["Content-Type"] = content_type
+    res.raw = io.BytesIO(body)
+    return res
+
+
+def test_accepts_events() -> None:
+    assert events.accepts_events(
+        RequestFile(url="https://example.com", headers={"accept": "text/event-stream"})
+    )
+    assert events.accepts_events(
+        RequestFile(
+            url="https://example.com",
+            headers={"Accept": "application/json, application/x-ndjson;q=0.9"},
+        )
+    )
+    assert not events.accepts_events(RequestFile(url="https://example.com"))
+
+
+def test_iter_events_sse() -> None:
+    res = _response(
+        "text/event-stream; charset=utf-8",
+        b": comment\r\n"
+        b"event: update\r\n"
+        b"id: 1\r\n"
+        b'data: {"a":\r\n'
+        b"data: 1}\r\n"
+        b"\r\n"
+        b"data:plain\n"
+        b"\n"
+        b"data: unterminated",
+    )
+    assert events.is_event_stream(res)
+    assert list(events.iter_events(res)) == [
+        events.Event("update", '{"a":\n1}', "1"),
+        events.Event("message", "plain", "1"),
+    ]
+
+
+def test_iter_events_ndjson() -> None:
+    res = _response("application/x-ndjson", b'{"a": 1}\n\n{"a": 2}\n')
+    assert [event.data for event in events.iter_events(res)] == ['{"a": 1}', '{"a": 2}']
+
+
+def test_iter_events_gzip() -> None:
+    res = _response("application/x-ndjson", gzip.compress(b'{"a": 1}\n{"a": 2}\n'))
+    res.headers["Content-Encoding"] = "gzip"
+    assert [event.data for event in events.iter_events(res)] == ['{"a": 1}', '{"a": 2}']
+
+
+def test_format_event() -> None:
+    event = events.Event("update", '{"a":1}')
+    assert list(events.format_event(event, Format.BODY)) == [b'{\n  "a": 1\n}']
+    assert list(events.format_event(event, Format.VERBOSE))[0] == "Event: update"
+    assert list(events.format_event(event, Format.NONE)) == []
+
+
+def test_exports_and_matches() -> None:
+    res = _response("text/event-stream", b"")
+    mdl = RequestFile(
+        url="https://example.com",
+        exports={"PROGRESS": "json:.progress", "STATUS": "status:"},
+    )
+    event = events.Event("message", '{"done": false, "progress": 0}')
+    assert dict(events.get_exports(event, res=res, mdl=mdl)) == {
+        "PROGRESS": "0",
+        "STATUS": "200",
+    }
+    assert not events.matches(event, res=res, pathspec="json:.done")
+    assert not events.matches(event, res=res, pathspec="json:.missing")
+    assert events.matches(event, res=res, pathspec="json:.progress")
+    assert events.matches(
+        events.Event("message", '{"done": true}'), res=res, pathspec="json:.done"
+    )
@@ -0,0 +1,66 @@
+import io
+from typing import Any
+
+import pytest
+import requests
+from request_file import export
+from request_file.model import RequestFile
+from requests_mock import Mocker
+
+
+@pytest.mark.parametrize(
+    ("pathspec", "value"),
+    [
+        ("json:.a.0.b", "c"),
+        ("header:location", "/next"),
+        ("header:Location", "/next"),
+        ("status:", "201"),
+        ('regex:"b": "(\\w+)"', "c"),
+        ("regex:\\[.*\\]", '[{"b": "c"}]'),
+    ],
+)
+def test_read_response_pathspec(
+    requests_mock: Mocker, pathspec: str, value: Any
+) -> None:
+    requests_mock.get(
+        "https://example.com",
+        status_code=201,
+        headers={"Location": "/next"},
+        text='{"a": [{"b": "c"}]}',
+    )
+    res = requests.get("https://example.com")
+    assert export.read_response_pathspec(res, pathspec) == value
+
+
+@pytest.mark.parametrize(
+    "pathspec",
+    ["header:Missing", "regex:missing", "regex:(", "status:200", "xml:."],
+)
+def test_read_response_pathspec_error(requests_mock: Mocker, pathspec: str) -> None:
+    requests_mock.get("https://example.com", text="{}")
+    res = requests.get("https://example.com")
+    with pytest.raises(ValueError):
+        export.read_response_pathspec(res, pathspec)
+
+
+def test_regex_streamed(requests_mock: Mocker, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(export, "REGEX_WINDOW", 16)
+    body = b"x" * 100 + 'token="caf\xe9"'.encode("utf-8") + b"y" * 100
+    requests_mock.get("https://example.com", body=io.BytesIO(body))
+    res = requests.get("https://example.com", stream=True)
+    res.encoding = "utf-8"
+    assert export.read_response_pathspec(res, 'regex:token="(.*?)"') == "caf\xe9"
+
+
+def test_can_stream() -> None:
+    def mdl(*pathspecs: str) -> RequestFile:
+        return RequestFile(
+            url="https://example.com",
+            exports={str(i): pathspec for i, pathspec in enumerate(pathspecs)},
+        )
+
+    assert export.can_stream(mdl())
+    assert export.can_stream(mdl("header:Location", "status:"))
+    assert export.can_stream(mdl("header:Location", "regex:a"))
+    assert not export.can_stream(mdl("regex:a", "regex:b"))
+    assert not export.can_stream(mdl("json:.a"))
@@ -1,6 +1,17 @@
+import gzip
+import io
+import json
+from typing import Iterator, List, Set
+
+import pytest
+from _pytest.capture import CaptureFixture
+from _pytest.monkeypatch import MonkeyPatch
 from py.path import local
-from request_file.main import main
+from request_file import main as main_module
+from request_file import metrics, replicas
+from request_file.main import _build_url, main
 from request_file.model import RequestFile
+from requests.exceptions import ConnectionError, ConnectTimeout, ReadTimeout
 from requests_mock import Mocker
 
 
@@ -15,3 +26,578 @@ def test_plain_get(tmpdir: local, requests_mock: Mocker) -> None:
         file.write(RequestFile(url="https://example.com").json())
     call(file.strpath)
     assert mocker.called_once
+
+
+def test_metrics_recorded(
+    tmpdir: local, state_dir: local, requests_mock: Mocker
+) -> None:
+    requests_mock.get("https://example.com", text="hello")
+    file = tmpdir / "file.json"
+    file.write(RequestFile(url="https://example.com").json())
+    call(file.strpath)
+    (record,) = metrics.read_records(state_dir.join("metrics").strpath)
+    assert record.host == "example.com"
+    assert record.status == 200
+    assert record.bytes_in == 5
+
+
+def test_segmented_download(tmpdir: local, requests_mock: Mocker) -> None:
+    requests_mock.head(
+        "https://example.com", headers={"Accept-Ranges": "bytes", "Content-Length": "4"}
+    )
+    requests_mock.get(
+        "https://example.com",
+        [
+            {"content": b"ab", "status_code": 206},
+            {"content": b"cd", "status_code": 206},
+        ],
+    )
+    file = tmpdir / "file.json"
+    file.write(RequestFile(url="https://example.com").json())
+    output = tmpdir / "output"
+    call(file.strpath, "--segments", "2", "-o", output.strpath)
+    assert len(output.read_binary()) == 4
+
+
+def test_segmented_download_error(
+    tmpdir: local, state_dir: local, requests_mock: Mocker
+) -> None:
+    requests_mock.head(
+        "https://example.com", headers={"Accept-Ranges": "bytes", "Content-Length": "4"}
+    )
+    requests_mock.get("https://example.com", status_code=500)
+    file = tmpdir / "file.json"
+    file.write(RequestFile(url="https://example.com").json())
+    with pytest.raises(SystemExit):
+        call(file.strpath, "--segments", "2", "-o", (tmpdir / "output").strpath)
+    records = list(metrics.read_records(state_dir.join("metrics").strpath))
+    assert [record.status for record in records] == [500]
+
+
+def test_build_url() -> None:
+    mdl = RequestFile(
+        url="http+unix://%2Frun%2Fapp.sock/health?a=1#anchor", params={"b": ["2", "3"]}
+    )
+    assert _build_url(mdl) == "http+unix://%2Frun%2Fapp.sock/health?a=1&b=2&b=3"
+    assert _build_url(RequestFile(url="https://example.com")) == "https://example.com"
+
+
+def test_if_stale(tmpdir: local, requests_mock: Mocker) -> None:
+    mocker = requests_mock.get("https://example.com", json={"token": "abc"})
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com",
+            params={"id": "{{ID}}"},
+            replacements={"{{ID}}": {"name": "ID"}},
+            exports={"TOKEN": "json:.token"},
+        ).json(by_alias=True)
+    )
+    exports = tmpdir / "exports"
+    call(file.strpath, "--if-stale", "-r", "ID=1", "-e", exports.strpath)
+    exports.remove()
+    call(file.strpath, "--if-stale", "-r", "ID=1", "-e", exports.strpath)
+    assert mocker.call_count == 1
+    assert "TOKEN='abc'" in exports.read()
+    call(file.strpath, "--if-stale", "-r", "ID=2")
+    assert mocker.call_count == 2
+
+
+def test_if_stale_ttl(tmpdir: local, requests_mock: Mocker) -> None:
+    mocker = requests_mock.get("https://example.com", json={"expires_in": 0})
+    file = tmpdir / "file.json"
+    file.write(RequestFile(url="https://example.com", ttl="json:.expires_in").json())
+    call(file.strpath, "--if-stale")
+    call(file.strpath, "--if-stale")
+    assert mocker.call_count == 2
+
+
+def test_stdin(
+    tmpdir: local,
+    requests_mock: Mocker,
+    monkeypatch: MonkeyPatch,
+    capsys: CaptureFixture,
+) -> None:
+    requests_mock.get("https://example.com/1", json={"id": 1})
+    requests_mock.get("https://example.com/2", text="two")
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com/{{ID}}", replacements={"{{ID}}": {"name": "ID"}}
+        ).json()
+    )
+    specs = [
+        json.dumps({"id": "a", "file": file.strpath, "replace": {"ID": 1}}),
+        json.dumps({"id": "b", "request": {"url": "https://example.com/2"}}),
+    ]
+    monkeypatch.setattr(main_module, "stdin", io.StringIO("\n".join(specs)))
+    call("--stdin")
+    results = {
+        result["id"]: result
+        for result in map(json.loads, capsys.readouterr().out.splitlines())
+    }
+    assert results["a"]["body"] == {"id": 1}
+    assert results["b"]["status"] == 200
+    assert results["b"]["body"] == "two"
+
+
+def test_no_stale_results(
+    tmpdir: local, requests_mock: Mocker, capsys: CaptureFixture
+) -> None:
+    mocker = requests_mock.get(
+        "https://example.com", [{"json": {"id": 1}}, {"json": {"id": 2}}]
+    )
+    requests_mock.post("https://example.com", json={})
+    get = tmpdir / "get.json"
+    get.write(RequestFile(url="https://example.com").json())
+    post = tmpdir / "post.json"
+    post.write(RequestFile(url="https://example.com", method="POST").json())
+    call(get.strpath, post.strpath, get.strpath)
+    assert mocker.call_count == 2
+    assert '"id": 2' in capsys.readouterr().out
+
+
+def test_namespaces(
+    tmpdir: local,
+    requests_mock: Mocker,
+    monkeypatch: MonkeyPatch,
+    capsys: CaptureFixture,
+) -> None:
+    requests_mock.get("https://staging.example.com", json={"token": "a"})
+    requests_mock.get("https://prod.example.com", json={"token": "b"})
+    monkeypatch.setenv("staging_HOST", "staging.example.com")
+    monkeypatch.setenv("prod_HOST", "prod.example.com")
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://{{HOST}}",
+            replacements={"{{HOST}}": {"name": "HOST"}},
+            exports={"TOKEN": "json:.token"},
+        ).json()
+    )
+    exports = tmpdir / "exports"
+    call(file.strpath, "--namespaces", "staging,prod", "-e", exports.strpath)
+    out = capsys.readouterr()
+    lines = out.out.splitlines()
+    assert lines[1].split() == ["namespace", "status", "latency", "body"]
+    assert lines[2].split()[:2] == ["staging", "200"]
+    assert lines[3].split()[:2] == ["prod", "200"]
+    assert lines[2].split()[-1] != lines[3].split()[-1]
+    assert {"staging_TOKEN='a'", "prod_TOKEN='b'"} <= set(exports.read().splitlines())
+
+
+def test_head_only_exports(tmpdir: local, requests_mock: Mocker) -> None:
+    class Unreadable(io.RawIOBase):
+        def read(self, size: int = -1) -> bytes:
+            raise AssertionError("body should not be read")
+
+    requests_mock.get(
+        "https://example.com", headers={"Location": "/next"}, body=Unreadable()
+    )
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com", exports={"NEXT": "header:Location"}
+        ).json()
+    )
+    exports = tmpdir / "exports"
+    call(file.strpath, "-f", "none", "-e", exports.strpath)
+    assert "NEXT='/next'" in exports.read()
+
+
+def test_chunking(tmpdir: local, requests_mock: Mocker, capsys: CaptureFixture) -> None:
+    mocker = requests_mock.get(
+        "https://example.com",
+        json=lambda request, context: [int(i) for i in request.qs["id"]],
+    )
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com",
+            params={"id": [str(i) for i in range(10)], "full": "true"},
+            chunking={"param": "id", "max_values": 3},
+        ).json()
+    )
+    call(file.strpath)
+    assert mocker.call_count == 4
+    assert all(request.qs["full"] == ["true"] for request in mocker.request_history)
+    assert json.loads(capsys.readouterr().out) == list(range(10))
+
+
+@pytest.mark.parametrize("mode", ["stdin", "namespaces", "every", "replay"])
+def test_chunking_everywhere(
+    tmpdir: local, requests_mock: Mocker, monkeypatch: MonkeyPatch, mode: str
+) -> None:
+    mocker = requests_mock.get(
+        "https://example.com",
+        json=lambda request, context: [int(i) for i in request.qs["id"]],
+    )
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com",
+            params={"id": [str(i) for i in range(10)]},
+            chunking={"param": "id", "max_values": 3},
+        ).json()
+    )
+    if mode == "stdin":
+        monkeypatch.setattr(
+            main_module, "stdin", io.StringIO(json.dumps({"file": file.strpath}))
+        )
+        call("--stdin")
+    elif mode == "namespaces":
+        call(file.strpath, "--namespaces", "a")
+    elif mode == "every":
+
+        def sleep(seconds: float) -> None:
+            raise KeyboardInterrupt()
+
+        monkeypatch.setattr(main_module.time, "sleep", sleep)
+        with pytest.raises(KeyboardInterrupt):
+            call(file.strpath, "--every", "5s")
+    else:
+        log = tmpdir / "log.jsonl"
+        log.write(json.dumps({"time": 0, "file": file.strpath}) + "\n")
+        call("replay", log.strpath)
+    assert sorted(len(request.qs["id"]) for request in mocker.request_history) == [
+        1,
+        3,
+        3,
+        3,
+    ]
+
+
+def test_every(
+    tmpdir: local,
+    requests_mock: Mocker,
+    monkeypatch: MonkeyPatch,
+    capsys: CaptureFixture,
+) -> None:
+    mocker = requests_mock.get(
+        "https://example.com",
+        [
+            {"text": "a", "headers": {"ETag": '"1"'}},
+            {"status_code": 304},
+            {"text": "b"},
+        ],
+    )
+
+    class Stop(Exception):
+        pass
+
+    def sleep(seconds: float) -> None:
+        if mocker.call_count == 3:
+            raise Stop()
+
+    monkeypatch.setattr(main_module.time, "sleep", sleep)
+    file = tmpdir / "file.json"
+    file.write(RequestFile(url="https://example.com").json())
+    try:
+        call(file.strpath, "--every", "5s")
+    except Stop:
+        pass
+    assert capsys.readouterr().out.splitlines() == ["a", "b"]
+    assert mocker.request_history[1].headers["If-None-Match"] == '"1"'
+
+
+def test_replay(tmpdir: local, requests_mock: Mocker, capsys: CaptureFixture) -> None:
+    mocker = requests_mock.get("https://example.com/1", text="")
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com/{{ID}}", replacements={"{{ID}}": {"name": "ID"}}
+        ).json()
+    )
+    log = tmpdir / "log.jsonl"
+    log.write(
+        "".join(
+            json.dumps({"time": when, "file": file.strpath, "replace": {"ID": "1"}})
+            + "\n"
+            for when in (0, 0.1)
+        )
+    )
+    call("replay", log.strpath, "--speed", "2x")
+    assert mocker.call_count == 2
+    assert capsys.readouterr().out.splitlines()[0] == "count=2 errors=0"
+
+
+def test_record_replay(
+    tmpdir: local, state_dir: local, requests_mock: Mocker, capsys: CaptureFixture
+) -> None:
+    mocker = requests_mock.get("https://example.com/1", text="")
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com/{{ID}}", replacements={"{{ID}}": {"name": "ID"}}
+        ).json()
+    )
+    log = tmpdir / "log.jsonl"
+    call(file.strpath, "-r", "ID=1", "--record-replay", log.strpath)
+    # Replacement values are only kept in the replay log
+    assert "replace" not in state_dir.join("metrics").read()
+
+    # Replaying the log resolves the request the same way
+    capsys.readouterr()
+    call("replay", log.strpath)
+    assert [req.url for req in mocker.request_history] == ["https://example.com/1"] * 2
+    assert capsys.readouterr().out.splitlines()[0] == "count=1 errors=0"
+
+
+def test_record_replay_chunked(tmpdir: local, requests_mock: Mocker) -> None:
+    mocker = requests_mock.get("https://example.com", json=[])
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com",
+            params={"id": [str(i) for i in range(10)]},
+            chunking={"param": "id", "max_values": 2},
+        ).json()
+    )
+    log = tmpdir / "log.jsonl"
+    call(file.strpath, "--record-replay", log.strpath)
+    assert len(log.readlines()) == 1
+    sent = sorted(req.url for req in mocker.request_history)
+    assert len(sent) == 5
+
+    call("replay", log.strpath)
+    assert sorted(req.url for req in mocker.request_history[5:]) == sent
+
+
+def test_record_replay_stdin(
+    tmpdir: local, requests_mock: Mocker, monkeypatch: MonkeyPatch
+) -> None:
+    mocker = requests_mock.get("https://example.com/1", text="")
+    spec = {
+        "id": "a",
+        "request": {
+            "url": "https://example.com/{{ID}}",
+            "replacements": {"{{ID}}": {"name": "ID"}},
+        },
+        "replace": {"ID": "1"},
+    }
+    monkeypatch.setattr(main_module, "stdin", io.StringIO(json.dumps(spec)))
+    log = tmpdir / "log.jsonl"
+    call("--stdin", "--record-replay", log.strpath)
+    call("replay", log.strpath)
+    assert mocker.call_count == 2
+
+
+def test_event_stream(
+    tmpdir: local, requests_mock: Mocker, capsys: CaptureFixture
+) -> None:
+    stream = (
+        b'data: {"progress": 50}\n\n'
+        b'data: {"progress": 100, "done": true}\n\n'
+        b'data: {"progress": 0}\n\n'
+    )
+    requests_mock.get(
+        "https://example.com",
+        [
+            {
+                "headers": {"Content-Type": "text/event-stream"},
+                "body": io.BytesIO(stream),
+            }
+            for _ in range(2)
+        ],
+    )
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com",
+            headers={"Accept": "text/event-stream"},
+            exports={"PROGRESS": "json:.progress"},
+            until="json:.done",
+        ).json()
+    )
+    exports = tmpdir / "exports"
+    call(file.strpath, "-f", "none", "-e", exports.strpath)
+    assert "PROGRESS='100'" in exports.read().splitlines()
+    call(file.strpath)
+    out = capsys.readouterr().out
+    assert '"progress": 50' in out
+    assert '"progress": 0' not in out
+
+
+def test_replicas(
+    tmpdir: local, requests_mock: Mocker, monkeypatch: MonkeyPatch
+) -> None:
+    monkeypatch.setattr(replicas, "PROBE_RATE", 0)
+    requests_mock.get("https://eu.example.com/api", exc=ConnectionError)
+    mocker = requests_mock.get("https://us.example.com/api", text="")
+    monkeypatch.setenv("REPLICAS", "https://eu.example.com,https://us.example.com")
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com/api",
+            replicas=["{{REPLICAS}}"],
+            replacements={"{{REPLICAS}}": {"name": "REPLICAS"}},
+        ).json()
+    )
+    call(file.strpath)
+    call(file.strpath)
+    assert mocker.call_count == 2
+    # The failing replica is only tried again once it's the last resort
+    assert requests_mock.call_count == 3
+
+
+@pytest.mark.parametrize(
+    ("method", "exc", "fails_over"),
+    [
+        ("GET", ReadTimeout, True),
+        ("POST", ConnectTimeout, True),
+        # The POST may have reached the first replica, so it isn't sent to another
+        ("POST", ReadTimeout, False),
+    ],
+)
+def test_replicas_fail_over(
+    tmpdir: local,
+    requests_mock: Mocker,
+    monkeypatch: MonkeyPatch,
+    method: str,
+    exc: type,
+    fails_over: bool,
+) -> None:
+    monkeypatch.setattr(replicas, "PROBE_RATE", 0)
+    requests_mock.register_uri(method, "https://eu.example.com/api", exc=exc)
+    mocker = requests_mock.register_uri(method, "https://us.example.com/api", text="")
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com/api",
+            method=method,
+            replicas=["https://eu.example.com", "https://us.example.com"],
+            retry={"attempts": 0},
+        ).json()
+    )
+    if fails_over:
+        call(file.strpath)
+    else:
+        with pytest.raises(exc):
+            call(file.strpath)
+    assert mocker.called == fails_over
+
+
+def test_compress(tmpdir: local, requests_mock: Mocker) -> None:
+    mocker = requests_mock.post("https://example.com", text="")
+    file = tmpdir / "file.json"
+    file.write(
+        json.dumps(
+            {
+                "url": "https://example.com",
+                "method": "POST",
+                "json": {"a": 1},
+                "compress": "gzip",
+            }
+        )
+    )
+    call(file.strpath)
+    request = mocker.last_request
+    assert request.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(b"".join(request.body))) == {"a": 1}
+
+
+def test_keep_encoding(
+    tmpdir: local, requests_mock: Mocker, capsys: CaptureFixture
+) -> None:
+    body = gzip.compress(b'{"a": "b"}')
+    mocker = requests_mock.get(
+        "https://example.com",
+        headers={"Content-Encoding": "gzip", "Content-Type": "application/json"},
+        content=body,
+    )
+    file = tmpdir / "file.json"
+    file.write(RequestFile(url="https://example.com", exports={"A": "json:.a"}).json())
+    output = tmpdir / "output.json.gz"
+    exports = tmpdir / "exports"
+    call(file.strpath, "--keep-encoding", "-o", output.strpath, "-e", exports.strpath)
+    assert output.read_binary() == body
+    assert mocker.last_request.headers["Accept-Encoding"] == "gzip, deflate"
+    assert json.loads(capsys.readouterr().out) == {"a": "b"}
+    assert "A='b'" in exports.read().splitlines()
+
+
+def test_max_memory(
+    tmpdir: local, requests_mock: Mocker, capsys: CaptureFixture
+) -> None:
+    body = json.dumps({"token": "a", "padding": "x" * 1024}).encode("utf-8")
+    requests_mock.get("https://example.com", content=body)
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(url="https://example.com", exports={"TOKEN": "json:.token"}).json()
+    )
+    output = tmpdir / "output.json"
+    exports = tmpdir / "exports"
+    call(
+        file.strpath, "--max-memory", "1k", "-o", output.strpath, "-e", exports.strpath
+    )
+    assert output.read_binary() == body + b"\n"
+    assert capsys.readouterr().out.encode("utf-8") == body + b"\n"
+    assert "TOKEN='a'" in exports.read().splitlines()
+
+
+@pytest.mark.parametrize("mode", ["accept-events", "keep-encoding"])
+def test_max_memory_streamed(
+    tmpdir: local, requests_mock: Mocker, capsys: CaptureFixture, mode: str
+) -> None:
+    # Bodies which were streamed for another reason are spooled too, so they are printed as received
+    body = json.dumps({"padding": "x" * 2048}).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if mode == "keep-encoding":
+        headers["Content-Encoding"] = "gzip"
+    requests_mock.get(
+        "https://example.com",
+        content=gzip.compress(body) if mode == "keep-encoding" else body,
+        headers=headers,
+    )
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com", headers={"Accept": "application/x-ndjson"}
+        ).json()
+    )
+    output = tmpdir / "output"
+    extra = ["--keep-encoding", "-o", output.strpath] if mode == "keep-encoding" else []
+    call(file.strpath, "--max-memory", "1k", *extra)
+    assert capsys.readouterr().out.encode("utf-8") == body + b"\n"
+
+
+def test_max_memory_if_stale(tmpdir: local, requests_mock: Mocker) -> None:
+    mocker = requests_mock.get("https://example.com", content=b"x" * 2048)
+    file = tmpdir / "file.json"
+    file.write(RequestFile(url="https://example.com").json())
+    # Spooled bodies aren't cached, so they are always requested again
+    call(file.strpath, "--max-memory", "1k", "--if-stale")
+    call(file.strpath, "--max-memory", "1k", "--if-stale")
+    assert mocker.call_count == 2
+    call(file.strpath, "--if-stale")
+    call(file.strpath, "--if-stale")
+    assert mocker.call_count == 3
+
+
+def test_watch_keeps_going(
+    tmpdir: local, requests_mock: Mocker, monkeypatch: MonkeyPatch
+) -> None:
+    mocker = requests_mock.get("https://example.com/1", text="")
+    file = tmpdir / "file.json"
+    file.write(
+        RequestFile(
+            url="https://example.com/{{ID}}",
+            replacements={"{{ID}}": {"name": "ID", "type": "integer", "default": "x"}},
+        ).json()
+    )
+
+    def changes(paths: List[str]) -> Iterator[Set[str]]:
+        # A bad default is fatal for a single run, but not for watch mode
+        file.write(
+            RequestFile(
+                url="https://example.com/{{ID}}",
+                replacements={
+                    "{{ID}}": {"name": "ID", "type": "integer", "default": "1"}
+                },
+            ).json()
+        )
+        yield {file.strpath}
+
+    monkeypatch.setattr(main_module.watch, "changes", changes)
+    call(file.strpath, "--watch", "--no-prompt")
+    assert mocker.called_once
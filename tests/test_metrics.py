@@ -0,0 +1,67 @@
+from py.path import local
+from request_file import metrics
+from request_file.metrics import MetricsRecord
+
+
+def record(**kwargs) -> MetricsRecord:
+    values = dict(
+        time=0.0,
+        file="a.json",
+        host="example.com",
+        method="GET",
+        status=200,
+        ttfb=0.0,
+        total=1.0,
+        bytes_out=0,
+        bytes_in=0,
+    )
+    values.update(kwargs)
+    return MetricsRecord(**values)
+
+
+def test_read_records_round_trip(tmpdir: local) -> None:
+    path = tmpdir.join("metrics").strpath
+    metrics.append_record(record(time=1.0), path=path)
+    with open(path, "a") as fp:
+        fp.write("not json\n")
+    metrics.append_record(record(time=2.0, status=500), path=path)
+    assert [r.status for r in metrics.read_records(path)] == [200, 500]
+    assert [r.status for r in metrics.read_records(path, since=1.5)] == [500]
+
+
+def test_read_records_missing_file(tmpdir: local) -> None:
+    assert list(metrics.read_records(tmpdir.join("missing").strpath)) == []
+
+
+def test_summarise_percentiles() -> None:
+    records = [record(total=float(i)) for i in range(1, 101)]
+    (summary,) = metrics.summarise(records)
+    assert summary.count == 100
+    assert summary.latency[50] == 50.5
+    assert summary.latency[99] == 99.01
+
+
+def test_summarise_by_host_and_window() -> None:
+    records = [
+        record(time=10.0, host="a", status=503),
+        record(time=70.0, host="a"),
+        record(time=20.0, host="b", cache="hit"),
+    ]
+    summaries = metrics.summarise(records, by="host", window=60.0)
+    assert [(s.key, s.window, s.count) for s in summaries] == [
+        ("a", 0.0, 1),
+        ("a", 60.0, 1),
+        ("b", 0.0, 1),
+    ]
+    assert summaries[0].errors == 1
+    assert summaries[2].hits == 1
+
+
+def test_write_prometheus(tmpdir: local) -> None:
+    path = tmpdir.join("request_file.prom").strpath
+    metrics.write_prometheus(metrics.summarise([record()]), path)
+    with open(path, "r") as fp:
+        text = fp.read()
+    assert 'request_file_latency_seconds{file="a.json",quantile="0.5"} 1.0' in text
+    assert 'request_file_requests_total{file="a.json"} 1' in text
+    assert not tmpdir.listdir(fil="*.tmp")
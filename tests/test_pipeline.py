@@ -0,0 +1,43 @@
+import threading
+from typing import List
+
+from request_file import pipeline
+from request_file.pipeline import Result, Spec
+
+
+def test_run() -> None:
+    results: List[Result] = []
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def execute(spec: Spec) -> Result:
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        try:
+            if spec.get("fail"):
+                raise ValueError("failed")
+            return {"value": spec["value"] * 2}
+        finally:
+            with lock:
+                in_flight -= 1
+
+    lines = [
+        *(f'{{"id": {i}, "value": {i}}}\n' for i in range(20)),
+        "\n",
+        "not json\n",
+        '{"fail": true}\n',
+    ]
+    pipeline.run(lines, execute=execute, emit=results.append, concurrency=3)
+
+    assert max_in_flight <= 3
+    assert len(results) == 22
+    assert sorted(r["value"] for r in results if "value" in r) == [
+        i * 2 for i in range(20)
+    ]
+    assert any(
+        r["line"] == 22 and r["error"].startswith("invalid spec:") for r in results
+    )
+    assert {"line": 23, "error": "failed"} in results
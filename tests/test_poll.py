@@ -0,0 +1,34 @@
+from request_file import poll
+from requests import Response
+
+
+def _response(status: int, body: bytes = b"", **headers: str) -> Response:
+    res = Response()
+    res.status_code = status
+    res.headers.update(headers)
+    res._content = body
+    return res
+
+
+def test_update() -> None:
+    state = poll.PollState()
+    assert state.conditional_headers({"Accept": "*/*"}) == {"Accept": "*/*"}
+    assert state.update(_response(200, b"a", etag='"1"'))
+    assert state.conditional_headers({}) == {"If-None-Match": '"1"'}
+    assert not state.update(_response(304))
+    assert not state.update(_response(200, b"a", etag='"1"'))
+    assert state.update(_response(200, b"b"))
+    assert state.conditional_headers({}) == {}
+
+
+def test_update_pathspecs() -> None:
+    state = poll.PollState(["json:.status"])
+    assert state.update(_response(200, b'{"status": "pending", "at": 1}'))
+    assert not state.update(_response(200, b'{"status": "pending", "at": 2}'))
+    assert state.update(_response(200, b'{"status": "done", "at": 3}'))
+
+
+def test_next_delay() -> None:
+    assert 0.9 <= poll.next_delay(1, 0) <= 1.1
+    assert 3.6 <= poll.next_delay(1, 2) <= 4.4
+    assert poll.next_delay(1, 100) <= poll.MAX_BACKOFF_FACTOR * 1.1
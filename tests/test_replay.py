@@ -0,0 +1,69 @@
+import time
+from typing import List
+
+import pytest
+from py.path import local
+from request_file import pipeline, replay
+
+
+def test_parse_speed() -> None:
+    assert replay.parse_speed("2x") == 2
+    assert replay.parse_speed("0.5") == 0.5
+    with pytest.raises(ValueError):
+        replay.parse_speed("0x")
+    with pytest.raises(ValueError):
+        replay.parse_speed("fast")
+
+
+def test_read_log(tmpdir: local) -> None:
+    log = tmpdir / "log.jsonl"
+    log.write(
+        '{"time": 20, "file": "b.json"}\n'
+        "\n"
+        '{"time": 10, "file": "a.json", "replace": {"ID": "1"}}\n'
+    )
+    assert replay.read_log([log.strpath]) == [
+        (10, {"file": "a.json", "replace": {"ID": "1"}}),
+        (20, {"file": "b.json"}),
+    ]
+    log.write('{"file": "a.json"}\n')
+    with pytest.raises(ValueError):
+        replay.read_log([log.strpath])
+    # Metrics have a record per send, so they aren't replayed
+    log.write('{"time": 10, "file": "a.json", "ttfb": 0.1}\n')
+    with pytest.raises(ValueError):
+        replay.read_log([log.strpath])
+
+
+def test_record(tmpdir: local) -> None:
+    log = tmpdir / "log.jsonl"
+    replay.record(log.strpath, {"file": "a.json", "replace": {"PASSWORD": "x"}})
+    replay.record(log.strpath, {"file": "b.json"})
+    assert log.stat().mode & 0o777 == 0o600
+    assert [spec for _, spec in replay.read_log([log.strpath])] == [
+        {"file": "a.json", "replace": {"PASSWORD": "x"}},
+        {"file": "b.json"},
+    ]
+
+
+def test_schedule() -> None:
+    started: List[float] = []
+
+    def execute(spec: pipeline.Spec) -> pipeline.Result:
+        started.append(time.monotonic())
+        if spec["fail"]:
+            raise ValueError("failed")
+        return {"status": 200}
+
+    start = time.monotonic()
+    outcomes = replay.schedule(
+        [(100, {"fail": False}), (101, {"fail": True}), (102, {"fail": False})],
+        execute=execute,
+        speed=10,
+        concurrency=2,
+    )
+    assert sorted(o.status for o in outcomes) == [0, 200, 200]
+    assert 0.2 <= max(started) - start < 1
+    lines = replay.report(outcomes)
+    assert lines[0] == "count=3 errors=1"
+    assert lines[1].startswith("lag: p50=")
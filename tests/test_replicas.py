@@ -0,0 +1,49 @@
+from _pytest.monkeypatch import MonkeyPatch
+from py.path import local
+from request_file import replicas
+
+
+def test_split() -> None:
+    assert replicas.split(["https://a/", "https://b, https://c", ""]) == [
+        "https://a",
+        "https://b",
+        "https://c",
+    ]
+
+
+def test_rebase() -> None:
+    assert (
+        replicas.rebase("https://eu.example.com/api?q=1", "http://us.example.com:8080")
+        == "http://us.example.com:8080/api?q=1"
+    )
+
+
+def test_order(tmpdir: local, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(replicas, "PROBE_RATE", 0)
+    path = tmpdir.join("replicas").strpath
+    stats = replicas.Replicas(path)
+    stats.record("https://slow", latency=0.5, error=False)
+    stats.record("https://fast", latency=0.1, error=False)
+    stats.record("https://down", latency=None, error=True)
+    stats.record("https://down", latency=None, error=True)
+    bases = ["https://down", "https://slow", "https://new", "https://fast"]
+    assert stats.order(bases) == [
+        "https://new",
+        "https://fast",
+        "https://slow",
+        "https://down",
+    ]
+
+    # Moving averages carry over between runs
+    stats = replicas.Replicas(path)
+    stats.record("https://slow", latency=0.0, error=False)
+    assert stats.get("https://slow").latency == 0.5 * (1 - replicas.ALPHA)
+    assert stats.get("https://down").error_rate > replicas.MAX_ERROR_RATE
+
+
+def test_order_probes(tmpdir: local, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(replicas, "PROBE_RATE", 1)
+    stats = replicas.Replicas(tmpdir.join("replicas").strpath)
+    stats.record("https://slow", latency=0.5, error=False)
+    stats.record("https://fast", latency=0.1, error=False)
+    assert stats.order(["https://fast", "https://slow"])[0] == "https://slow"
@@ -0,0 +1,112 @@
+import time
+from typing import Callable, List
+
+import pytest
+import requests
+from request_file import retry
+from request_file.model import RetryPolicy
+from requests.exceptions import ConnectTimeout, ReadTimeout
+from requests_mock import Mocker
+
+_policy = RetryPolicy(attempts=2, backoff=0)
+
+
+def sender(method: str = "GET") -> Callable[[], requests.Response]:
+    return lambda: requests.request(method, "https://example.com")
+
+
+def test_retry_status(requests_mock: Mocker) -> None:
+    mocker = requests_mock.get(
+        "https://example.com",
+        [{"status_code": 503}, {"status_code": 502}, {"status_code": 200}],
+    )
+    res = retry.send(sender(), method="GET", policy=_policy)
+    assert res.status_code == 200
+    assert mocker.call_count == 3
+
+
+def test_retry_gives_up(requests_mock: Mocker) -> None:
+    mocker = requests_mock.get("https://example.com", status_code=503)
+    res = retry.send(sender(), method="GET", policy=_policy)
+    assert res.status_code == 503
+    assert mocker.call_count == 3
+
+
+def test_retry_after_too_long(requests_mock: Mocker) -> None:
+    mocker = requests_mock.get(
+        "https://example.com", status_code=429, headers={"Retry-After": "3600"}
+    )
+    res = retry.send(sender(), method="GET", policy=_policy)
+    assert res.status_code == 429
+    assert mocker.call_count == 1
+
+
+def test_retry_not_idempotent(requests_mock: Mocker) -> None:
+    mocker = requests_mock.post(
+        "https://example.com",
+        [{"exc": ReadTimeout}, {"status_code": 503}, {"status_code": 200}],
+    )
+    with pytest.raises(ReadTimeout):
+        retry.send(sender("POST"), method="POST", policy=_policy)
+    res = retry.send(sender("POST"), method="POST", policy=_policy)
+    assert res.status_code == 503
+    assert mocker.call_count == 2
+
+
+def test_retry_not_sent(requests_mock: Mocker) -> None:
+    requests_mock.post(
+        "https://example.com", [{"exc": ConnectTimeout}, {"status_code": 200}]
+    )
+    res = retry.send(sender("POST"), method="POST", policy=_policy)
+    assert res.status_code == 200
+
+
+def test_hedged() -> None:
+    delays = [1.0, 0.0]
+    sent: List[float] = []
+
+    def request() -> requests.Response:
+        delay = delays[len(sent)]
+        sent.append(delay)
+        time.sleep(delay)
+        res = requests.Response()
+        res.status_code = 200 if delay else 201
+        return res
+
+    start = time.monotonic()
+    assert retry.hedged(request, delay=0.05).status_code == 201
+    assert time.monotonic() - start < 0.5
+    assert sent == [1.0, 0.0]
+
+
+def test_hedged_closes_loser() -> None:
+    delays = [0.2, 0.0]
+    sent: List[requests.Response] = []
+    closed: List[requests.Response] = []
+
+    def request() -> requests.Response:
+        res = requests.Response()
+        res.status_code = 200 if not sent else 201
+        res.close = lambda: closed.append(res)  # type: ignore
+        delay = delays[len(sent)]
+        sent.append(res)
+        time.sleep(delay)
+        return res
+
+    assert retry.hedged(request, delay=0.05).status_code == 201
+    assert closed == []
+    time.sleep(0.3)
+    assert closed == [sent[0]]
+
+
+def test_hedged_not_needed() -> None:
+    sent: List[int] = []
+
+    def request() -> requests.Response:
+        sent.append(1)
+        res = requests.Response()
+        res.status_code = 200
+        return res
+
+    assert retry.hedged(request, delay=1).status_code == 200
+    assert sent == [1]
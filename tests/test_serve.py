@@ -0,0 +1,114 @@
+import threading
+from typing import Generator
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+import requests
+from py.path import local
+from request_file import codec, serve
+from request_file.format import Format, format
+from request_file.model import RequestFile
+from requests import Response
+
+
+@pytest.fixture
+def server(tmpdir: local) -> Generator[str, None, None]:
+    fixtures_dir = tmpdir.mkdir("fixtures")
+    fixtures_dir.join("user.json").write(
+        codec.dumps(
+            {
+                "method": "GET",
+                "url": "https://example.com/users?b=2&a=1",
+                "status_code": 200,
+                "reason": "OK",
+                "headers": {"Content-Type": "application/json", "Content-Length": "1"},
+                "json": {"name": "a"},
+            }
+        )
+    )
+    recorded = Response()
+    recorded.status_code = 201
+    recorded.reason = "Created"
+    recorded.url = "https://example.com/blob"
+    recorded.headers["Content-Type"] = "application/octet-stream"
+    recorded._content = b"\x00\x01"
+    fixtures_dir.join("blob.json").write_binary(
+        b"".join(
+            format(
+                res=recorded,
+                mdl=RequestFile(url=recorded.url, method="POST"),
+                format=Format.REQUESTS_MOCK,
+            )
+        )
+    )
+
+    fixtures = serve.Fixtures(fixtures_dir.strpath)
+    assert len(fixtures) == 2
+    with serve.serve(fixtures, host="127.0.0.1", port=0) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            yield f"http://127.0.0.1:{server.server_address[1]}"
+        finally:
+            server.shutdown()
+            thread.join()
+            fixtures.close()
+
+
+def test_request_key() -> None:
+    assert serve.request_key("get", "https://example.com/a?b=2&a=1") == (
+        "GET",
+        "/a",
+        "a=1&b=2",
+    )
+    assert serve.request_key("GET", "/?a=1&b=2") == serve.request_key(
+        "GET", "http://localhost/?b=2&a=1"
+    )
+
+
+def test_serve(server: str) -> None:
+    with requests.Session() as session:
+        for _ in range(2):
+            res = session.get(f"{server}/users?a=1&b=2")
+            assert res.status_code == 200
+            assert res.json() == {"name": "a"}
+            assert res.headers["Content-Length"] == str(len(res.content))
+
+        res = session.head(f"{server}/users?a=1&b=2")
+        assert res.status_code == 200
+        assert res.content == b""
+
+        res = session.post(f"{server}/blob", data=b"ignored")
+        assert res.status_code == 201
+        assert res.reason == "Created"
+        assert res.content == b"\x00\x01"
+
+        assert session.get(f"{server}/users").status_code == 404
+        assert session.get(f"{server}/blob").status_code == 404
+
+
+def test_index(tmpdir: local, monkeypatch: MonkeyPatch) -> None:
+    fixtures_dir = tmpdir.mkdir("fixtures")
+    fixture = fixtures_dir.join("a.json")
+    fixture.write(codec.dumps({"url": "https://example.com/a", "text": "a"}))
+    index_path = tmpdir.join("index").strpath
+    serve.Fixtures(fixtures_dir.strpath, index_path=index_path).close()
+
+    # Unchanged fixtures are indexed without being parsed
+    parsed = []
+    mocks = serve._mocks
+    monkeypatch.setattr(
+        serve, "_mocks", lambda path: parsed.append(path) or mocks(path)
+    )
+    fixtures = serve.Fixtures(fixtures_dir.strpath, index_path=index_path)
+    assert len(fixtures) == 1
+    assert parsed == []
+    assert fixtures.get("GET", "/a") is not None
+    assert parsed == [fixture.strpath]
+    fixtures.close()
+
+    fixture.write(codec.dumps([{"url": "https://example.com/b"}, {"url": "/c"}]))
+    fixtures = serve.Fixtures(fixtures_dir.strpath, index_path=index_path)
+    assert len(fixtures) == 2
+    assert fixtures.get("GET", "/a") is None
+    fixtures.close()
@@ -0,0 +1,69 @@
+import io
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from request_file import spool
+from request_file.export import read_pathspec, read_response_pathspec
+from request_file.format import Format, format
+from request_file.model import RequestFile
+from request_file.units import parse_size
+from requests import Response
+
+
+def _response(body: bytes) -> Response:
+    res = Response()
+    res.status_code = 200
+    res.raw = io.BytesIO(body)
+    return res
+
+
+def test_parse_size() -> None:
+    assert parse_size("100") == 100
+    assert parse_size("1.5k") == 1536
+    assert parse_size("64MB") == 64 * 1024**2
+    assert parse_size("2GiB") == 2 * 1024**3
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_read_in_memory() -> None:
+    res = _response(b'{"a": 1}')
+    spool.read(res, max_memory=1024)
+    assert not spool.is_spooled(res)
+    assert res.content == b'{"a": 1}'
+
+
+def test_read_spooled() -> None:
+    body = b'{"a": "' + b"x" * (spool.CHUNK_SIZE * 3) + b'", "b": 2}'
+    res = _response(body)
+    spool.read(res, max_memory=10)
+    assert spool.is_spooled(res)
+    assert len(res.content) == len(body)
+    assert list(
+        format(res, mdl=RequestFile(url="https://example.com"), format=Format.BODY)
+    ) == [res.content]
+    assert read_pathspec(res.content, "json:.b") == 2
+    assert read_response_pathspec(res, 'regex:"b": (\\d)') == "2"
+
+
+def test_in_memory_warnings(monkeypatch: MonkeyPatch) -> None:
+    warnings = io.StringIO()
+    monkeypatch.setattr(spool, "stderr", warnings)
+    res = _response(b'{"a": "' + b"x" * spool.CHUNK_SIZE + b'", "b": 2}')
+    spool.read(res, max_memory=10)
+    mdl = RequestFile(url="https://example.com")
+
+    # These read the body from disk
+    list(format(res, mdl=mdl, format=Format.BODY))
+    list(format(res, mdl=mdl, format=Format.VERBOSE))
+    assert read_response_pathspec(res, 'regex:"b": (\\d)') == "2"
+    assert read_response_pathspec(res, "status:") == "200"
+    assert warnings.getvalue() == ""
+
+    # These need it all in memory
+    assert read_response_pathspec(res, "json:.b") == 2
+    list(format(res, mdl=mdl, format=Format.REQUESTS_MOCK))
+    assert warnings.getvalue().splitlines() == [
+        f"spool: warning: json pathspec reads the whole {len(res.content)} byte body into memory",
+        f"spool: warning: --format requests-mock reads the whole {len(res.content)} byte body into memory",
+    ]
@@ -0,0 +1,53 @@
+import threading
+from http.server import BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Any, Generator
+from urllib.parse import quote
+
+import pytest
+import requests
+from py.path import local
+from request_file import unix
+
+
+class _Server(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        body = f"{self.path} {self.headers['Host']}".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def socket_path(tmpdir: local) -> Generator[str, None, None]:
+    path = tmpdir.join("server.sock").strpath
+    server = _Server(path, _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def test_unix_url(socket_path: str) -> None:
+    with requests.Session() as session:
+        session.mount(f"{unix.SCHEME}://", unix.UnixAdapter())
+        url = f"{unix.SCHEME}://{quote(socket_path, safe='')}/health?full=1"
+        assert session.get(url).text == "/health?full=1 localhost"
+        assert session.get(url).text == "/health?full=1 localhost"
+
+
+def test_unix_socket_path(socket_path: str) -> None:
+    with requests.Session() as session:
+        session.mount("http://", unix.UnixAdapter(socket_path))
+        assert session.get("http://localhost/health").text == "/health localhost"
@@ -0,0 +1,22 @@
+import threading
+import time
+
+from py.path import local
+from request_file import watch
+
+
+def test_changes(tmpdir: local) -> None:
+    file = tmpdir / "file.json"
+    other = tmpdir / "other.json"
+    file.write("{}")
+    other.write("{}")
+    changes = watch.changes([file.strpath, other.strpath], interval=0.01, debounce=0)
+
+    def modify() -> None:
+        time.sleep(0.05)
+        file.write('{"url": "https://example.com"}')
+
+    thread = threading.Thread(target=modify)
+    thread.start()
+    assert next(changes) == {file.strpath}
+    thread.join()